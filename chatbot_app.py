@@ -1,8 +1,10 @@
 # 🌍 Creative Role-based Chatbot by Nayujeong
 # Run this app: streamlit run app.py
 
+import uuid
 import streamlit as st
-import openai
+from src.llm_backends import OpenAIBackend
+from src import usage_ledger
 
 # --- PAGE SETUP ---
 st.set_page_config(
@@ -11,6 +13,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+usage_ledger.set_session(st.session_state.setdefault("usage_session", uuid.uuid4().hex[:12]))
+
 # --- HEADER / HOME PAGE ---
 st.markdown("""
 <div style="text-align:center; background-color:#f7f0f5; padding:20px; border-radius:15px;">
@@ -58,21 +62,21 @@ col1, col2 = st.columns([2,1])
 with col1:
     st.markdown("### 💬 Chat with your AI professional")
     if api_key:
-        openai.api_key = api_key
+        backend = OpenAIBackend(api_key, model="gpt-3.5-turbo")
         user_input = st.text_area("Ask something:", height=100)
         if st.button("✨ Generate Response"):
             if user_input.strip():
-                with st.spinner("Thinking like a pro..."):
-                    response = openai.ChatCompletion.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
+                with st.spinner("Thinking like a pro..."), usage_ledger.usage_context(feature="chatbot"):
+                    response = backend.complete(
+                        [
                             {"role": "system", "content": roles[role]},
                             {"role": "user", "content": user_input}
                         ],
-                        temperature=0.8
+                        temperature=0.8,
+                        max_tokens=None,  # no output cap, as before
                     )
                     st.markdown("### 🧩 Response:")
-                    st.write(response["choices"][0]["message"]["content"])
+                    st.write(response)
             else:
                 st.warning("Please type something first!")
     else:
@@ -1,15 +1,25 @@
 import os
-import json
+import time
+import uuid
 import re       # <- 반드시 필요
+import base64
+from itertools import islice
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from PIL import Image
+from PIL import Image, ImageStat
 from io import BytesIO
 import numpy as np
-from src.met_api import search, get_object
-from src.curator import explain_object
+from src.met_api import search, get_objects, iter_search, api_stats, memory_cache_info
+from src.curator import explain_objects, stream_explain_object
+from src import note_prefetch
+from src.openai_clients import get_client
+from src.image_cache import image_source, warm_images
 from src.viz import plot_year_histogram
+from src import metrics
+from src import usage_ledger
+from src import upload_store
+from src.catalog_db import catalog_db
 
 
 # -------------------------------------------
@@ -119,6 +129,9 @@ profile_html = """
 st.markdown(profile_html, unsafe_allow_html=True)
 
 
+# LLM usage is accounted per browser session
+usage_ledger.set_session(st.session_state.setdefault("usage_session", uuid.uuid4().hex[:12]))
+
 # Tabs
 tab_gallery, tab_dashboard, tab_upload, tab_ai_gen = st.tabs(
     ["🖼 Gallery", "📊 Dashboard", "⬆️ Upload & Color Viz", "🤖 AI Generation"]
@@ -127,7 +140,7 @@ tab_gallery, tab_dashboard, tab_upload, tab_ai_gen = st.tabs(
 
 # ------------------ GALLERY TAB ------------------
 
-with tab_gallery:
+with tab_gallery, metrics.timer("render_seconds", section="gallery"):
     st.markdown("### Gallery — The Met + Generated Works")
 
     with st.sidebar:
@@ -136,63 +149,88 @@ with tab_gallery:
         cols_num = st.selectbox("Columns", [2,3,4], index=1)
         max_results = st.slider("Max results", 6,36,12,6)
         api_key_input = st.text_input("Your OpenAI API Key (optional)", type="password")
+        prewarm_notes = st.checkbox(
+            f"Pre-warm curator notes (top {note_prefetch.TOP_N})", value=note_prefetch.ENABLED,
+            help="Generate notes for the first results in the background so Curator Note opens instantly.",
+        )
 
     if q:
-        ids = search(q, max_results)
-        if not ids:
-            st.warning("검색 결과가 없습니다.")
-        else:
-            metas = [get_object(i) for i in ids[:max_results]]
-            cols = st.columns(cols_num)
-
-            # ----------------------
-            # Select to Compare
-            # ----------------------
-            select_options = [f"{m.get('title','Untitled')} — {m.get('artistDisplayName','Unknown')}" for m in metas]
-            selected_compare = st.multiselect("Select artworks to compare", options=select_options)
-
-            for i, meta in enumerate(metas):
+        # "Load more" extends the same query; earlier pages come from cache
+        if st.session_state.get("gallery_query") != q:
+            st.session_state["gallery_query"] = q
+            st.session_state["gallery_pages"] = 1
+        shown = max_results * st.session_state["gallery_pages"]
+
+        metas = []
+        cols = st.columns(cols_num)
+        thumb_width = 1200 // cols_num
+        results = iter_search(q, page_size=max_results, max_results=shown)
+        while True:
+            # 페이지 단위로 이미지를 동시에 받아 두고 그린다 (다음 페이지 메타데이터는 iter_search가 미리 가져옴)
+            page = list(islice(results, max_results))
+            if not page:
+                break
+            thumbs = warm_images([m.get("primaryImageSmall") or m.get("primaryImage") for m in page], thumb_width)
+            for meta in page:
+                i = len(metas)
+                metas.append(meta)
                 with cols[i%cols_num]:
                     img = meta.get("primaryImageSmall") or meta.get("primaryImage")
                     if img:
-                        st.image(img, use_column_width=True, caption=f"**{meta.get('title','Untitled')}** — {meta.get('artistDisplayName','Unknown')}")
+                        st.image(thumbs[img].result(), use_column_width=True, caption=f"**{meta.get('title','Untitled')}** — {meta.get('artistDisplayName','Unknown')}")
 
                     # Curator Note 버튼 (개별 작품)
                     if st.button("Curator Note", key=f"note_{meta.get('objectID')}"):
                         if not api_key_input:
                             st.warning("Please enter your OpenAI API key in the sidebar to generate a curator note.")
                         else:
-                            with st.spinner("Generating curator note..."):
-                                note = explain_object(meta, api_key=api_key_input)
-                                st.markdown("---")
-                                st.subheader("Curator Note")
-                                st.write(note)
+                            st.markdown("---")
+                            st.subheader("Curator Note")
+                            st.write_stream(stream_explain_object(meta, api_key=api_key_input))
+
+        if not metas:
+            st.warning("검색 결과가 없습니다.")
+        else:
+            if prewarm_notes and api_key_input:
+                note_prefetch.prefetch_notes(metas, api_key_input)
+
+            if len(metas) >= shown and st.button("Load more", key="gallery_load_more"):
+                st.session_state["gallery_pages"] += 1
+                st.rerun()
+
+            # ----------------------
+            # Select to Compare
+            # ----------------------
+            select_options = [f"{m.get('title','Untitled')} — {m.get('artistDisplayName','Unknown')}" for m in metas]
+            selected_compare = st.multiselect("Select artworks to compare", options=select_options)
 
             # ----------------------
             # 선택 작품 비교 및 큐레이터 노트
             # ----------------------
             if selected_compare:
                 st.markdown("### 🔍 Selected Artworks Comparison")
-                for s in selected_compare:
-                    idx = select_options.index(s)
-                    m = metas[idx]
+                compare_metas = [metas[select_options.index(s)] for s in selected_compare]
+                compare_images = warm_images([m.get("primaryImageSmall") or m.get("primaryImage") for m in compare_metas], 300)
+                compare_notes = []
+                if api_key_input:
+                    # 모든 작품의 큐레이터 노트를 동시에 생성
+                    with st.spinner(f"Generating curator notes for {len(compare_metas)} artworks..."):
+                        compare_notes = explain_objects(compare_metas, api_key=api_key_input, compare=True)
+                for i, m in enumerate(compare_metas):
                     st.write(f"**{m.get('title','Untitled')} — {m.get('artistDisplayName','Unknown')}**")
                     st.write(f"Date: {m.get('objectDate','Unknown')}, Medium: {m.get('medium','Unknown')}, Country: {derive_country(m)}")
                     img = m.get("primaryImageSmall") or m.get("primaryImage")
                     if img:
-                        st.image(img, width=300)
-
-                    # 큐레이터 노트 API 호출
-                    if api_key_input:
-                        with st.spinner(f"Generating curator note for {m.get('title','Untitled')}..."):
-                            note = explain_object(m, api_key=api_key_input, compare_with=selected_compare)
-                            st.markdown("**Curator Note:**")
-                            st.write(note)
+                        st.image(compare_images[img].result(), width=300)
+
+                    if compare_notes:
+                        st.markdown("**Curator Note:**")
+                        st.write(compare_notes[i])
                     else:
                         st.info("Enter OpenAI API key in sidebar to generate curator note.")
 # ------------------ AI GENERATION TAB ------------------
 
-with tab_ai_gen:
+with tab_ai_gen, metrics.timer("render_seconds", section="ai_generation"):
     st.markdown("### Generate AI Images Based on Your Favorite Artwork")
     
     # Step 1: Keyword / Object selection
@@ -203,7 +241,7 @@ with tab_ai_gen:
     if fav_keyword and api_key_ai:
         # Fetch artworks
         ids_fav = search(fav_keyword, fav_max_results)
-        metas_fav = [get_object(i) for i in ids_fav]
+        metas_fav = get_objects(ids_fav)
         
         st.markdown("#### Select your favorite artwork")
         fav_options = [f"{m.get('title','Untitled')} — {m.get('artistDisplayName','Unknown')}" for m in metas_fav]
@@ -215,17 +253,14 @@ with tab_ai_gen:
             img_url = fav_art.get("primaryImageSmall") or fav_art.get("primaryImage")
             
             if img_url:
-                st.image(img_url, width=300, caption=f"**{fav_art.get('title','Untitled')}**")
+                st.image(image_source(img_url, 300), width=300, caption=f"**{fav_art.get('title','Untitled')}**")
             
             # Step 2: Generate AI image
             if st.button("Generate Similar AI Image"):
-                import openai
-                openai.api_key = api_key_ai
-                
                 with st.spinner("Generating AI image..."):
                     prompt = f"Create an AI-generated image similar in style and content to '{fav_art.get('title','Untitled')}' by {fav_art.get('artistDisplayName','Unknown')}. Focus on the artistic style and composition."
                     
-                    response = openai.images.generate(
+                    response = get_client(api_key_ai).images.generate(
                         model="gpt-image-1",
                         prompt=prompt,
                         size="1024x1024"
@@ -239,7 +274,7 @@ with tab_ai_gen:
 
 
 # ------------------ DASHBOARD TAB ------------------
-with tab_dashboard:
+with tab_dashboard, metrics.timer("render_seconds", section="dashboard"):
     st.markdown("### 📊 Dashboard — Analytics (Country & Medium)")
 
     # key를 고유하게 변경
@@ -248,45 +283,56 @@ with tab_dashboard:
     
     if q_dash:
         ids_dash = search(q_dash, n_dash)
-        metas_dash = [get_object(i) for i in ids_dash]
-
-        if not metas_dash:
+        metas_dash = get_objects(ids_dash)
+        db = catalog_db()
+        # 검색 결과는 로컬 카탈로그(SQLite)에 쌓이고, 차트는 인덱스된 쿼리로 집계
+        db.upsert_met(metas_dash, country_of=derive_country)
+
+        scope = st.radio("Scope", ["This search", "Whole local catalog"], horizontal=True, key="dashboard_scope")
+        f1, f2 = st.columns(2)
+        with f1:
+            artist_dash = st.selectbox("Artist", ["All"] + db.artists(), key="dashboard_artist")
+        with f2:
+            years_dash = st.slider("Years", -3000, 2030, (-3000, 2030), key="dashboard_years")
+        filters = {"ids": ids_dash} if scope == "This search" else {}
+        if artist_dash != "All":
+            filters["artist"] = artist_dash
+        if years_dash != (-3000, 2030):
+            filters["year_from"], filters["year_to"] = years_dash
+
+        df_country = pd.DataFrame(db.counts("country", **filters), columns=["country", "count"])
+        df_medium = pd.DataFrame(db.counts("medium", **filters), columns=["medium", "count"])
+
+        if df_country.empty:
             st.warning("검색 결과가 없습니다.")
         else:
-            # 국가 및 재료 정보 보완
-            countries = [derive_country(m) for m in metas_dash]
-            mediums = [m.get("medium", "Unknown") for m in metas_dash]
-
-            df_meta = pd.DataFrame({
-                "country": countries,
-                "medium": mediums,
-                "title": [m.get("title","Unknown") for m in metas_dash]
-            })
-
             # Country Treemap
             st.markdown("### 🌍 Country Distribution Treemap")
-            if df_meta["country"].nunique() > 1:
-                fig_country = px.treemap(df_meta, path=['country'], title="Country Treemap")
+            if len(df_country) > 1:
+                with metrics.timer("render_seconds", section="dashboard_country_treemap"):
+                    fig_country = px.treemap(df_country, path=['country'], values='count', title="Country Treemap")
                 st.plotly_chart(fig_country, use_container_width=True)
             else:
                 st.info("국가 데이터가 부족합니다.")
 
             # Medium / Material Treemap
             st.markdown("### 🧵 Medium / Material Treemap")
-            if df_meta["medium"].nunique() > 1:
-                fig_medium = px.treemap(df_meta, path=['medium'], title="Medium / Material Treemap")
+            if len(df_medium) > 1:
+                with metrics.timer("render_seconds", section="dashboard_medium_treemap"):
+                    fig_medium = px.treemap(df_medium, path=['medium'], values='count', title="Medium / Material Treemap")
                 st.plotly_chart(fig_medium, use_container_width=True)
             else:
                 st.info("재료 데이터가 부족합니다.")
 
             # Optional: Sample Table
             if st.checkbox("Show Sample Table", key="dashboard_sample_table"):
-                st.dataframe(df_meta.head(10))
+                sample_rows = db.query(limit=10, **filters)
+                st.dataframe(pd.DataFrame(sample_rows, columns=["title", "artist", "object_date", "country", "medium", "source"]))
 
 
 
 # ------------------ UPLOAD & COLOR VIZ TAB ------------------
-with tab_upload:
+with tab_upload, metrics.timer("render_seconds", section="upload"):
     st.markdown("### Upload your AI-generated images")
     uploaded = st.file_uploader("Upload PNG/JPG (multiple allowed)", type=["png","jpg","jpeg"], accept_multiple_files=True)
     save_to_catalog = st.checkbox("Save to local catalog", value=False)
@@ -339,9 +385,6 @@ with tab_upload:
 
             # ---- (NEW) AI Style Description ----
             if api_key_style and st.button(f"AI Style Description — {f.name}", key=f"ai_desc_{f.name}"):
-                import openai
-                openai.api_key = api_key_style
-
                 with st.spinner("Analyzing style..."):
                     prompt = f"""
                     You are an art expert. Analyze this image based on brightness {brightness:.2f}, 
@@ -353,33 +396,65 @@ with tab_upload:
                     img.save(buf, format="PNG")
                     img_bytes = buf.getvalue()
 
-                    response = openai.chat.completions.create(
+                    style_messages = [
+                        {"role": "system", "content": "You are an art curator."},
+                        {"role": "user", "content": [
+                            {"type": "text", "text": prompt},
+                            {"type": "image_url", "image_url": "data:image/png;base64," + base64.b64encode(img_bytes).decode()}
+                        ]}
+                    ]
+                    started = time.perf_counter()
+                    response = get_client(api_key_style).chat.completions.create(
                         model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": "You are an art curator."},
-                            {"role": "user", "content": [
-                                {"type": "text", "text": prompt},
-                                {"type": "image_url", "image_url": "data:image/png;base64," + base64.b64encode(img_bytes).decode()}
-                            ]}
-                        ]
+                        messages=style_messages
                     )
+                    usage_ledger.record_response(response, "openai", "gpt-4o-mini", time.perf_counter() - started,
+                                                 messages=style_messages, feature="style_description")
                     st.write(response.choices[0].message.content)
 
             # Save uploaded image
             if save_to_catalog:
-                os.makedirs("data", exist_ok=True)
-                path = os.path.join("data","generated_catalog.json")
-                try:
-                    with open(path,"r",encoding="utf-8") as g:
-                        catalog = json.load(g)
-                except:
-                    catalog=[]
-                bio = BytesIO()
-                img.save(bio, format="PNG")
-                b = bio.getvalue().decode("latin1")
-                catalog.append({"title":f.name, "description":"","image_bytes":b})
-                with open(path,"w",encoding="utf-8") as g:
-                    json.dump(catalog,g,ensure_ascii=False, indent=2)
-                st.success("Saved to generated_catalog.json")
+                # Streamlit reruns this block on every interaction: save each file once per session
+                saved = st.session_state.setdefault("saved_uploads", {})
+                record = saved.get((f.name, f.size))
+                if record is None:
+                    bio = BytesIO()
+                    img.save(bio, format="PNG")
+                    record = saved[(f.name, f.size)] = upload_store.save_upload(bio.getvalue(), f.name)
+                    catalog_db().upsert_upload(record)
+                st.success(f"Saved to the local catalog ({record['sha256'][:12]})")
     else:
         st.info("Upload images to visualize RGB color distribution and palette.")
+
+
+# ------------------ DIAGNOSTICS (hidden) ------------------
+# Open with ?diagnostics=1 in the URL or AI_MUSEUM_DIAGNOSTICS=1 in the environment
+if st.query_params.get("diagnostics") == "1" or os.environ.get("AI_MUSEUM_DIAGNOSTICS") == "1":
+    st.markdown("---")
+    st.markdown("### 🩺 Diagnostics")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("**Met API**")
+        st.json(api_stats())
+    with c2:
+        st.markdown("**Object memory cache**")
+        st.json(memory_cache_info())
+
+    rows = metrics.snapshot()
+    if rows:
+        df_metrics = pd.DataFrame(rows)
+        df_metrics["labels"] = df_metrics["labels"].apply(lambda d: ", ".join(f"{k}={v}" for k, v in d.items()))
+        st.dataframe(df_metrics, use_container_width=True)
+
+    st.markdown("**LLM usage** (tokens, approximate cost, latency of uncached calls)")
+    usage_by = st.radio("Group by", ["day", "session", "feature", "model"], horizontal=True, key="usage_group_by")
+    usage_rows = usage_ledger.ledger().aggregate(usage_by)
+    if usage_rows:
+        st.dataframe(pd.DataFrame(usage_rows), use_container_width=True)
+    else:
+        st.caption("No LLM calls recorded yet.")
+
+    prom_text = metrics.export_prometheus()
+    st.download_button("Download Prometheus metrics", prom_text, file_name="metrics.prom", mime="text/plain")
+    with st.expander("Prometheus text"):
+        st.code(prom_text)
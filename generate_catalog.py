@@ -1,41 +1,253 @@
-import requests
-import json
-from src.curator import explain_object
-
-BASE = "https://collectionapi.metmuseum.org/public/collection/v1"
-
-def search_met(query, limit=10):
-    params = {"q": query, "hasImages": "true", "title": "true", "tags": "true"}
-    resp = requests.get(f"{BASE}/search", params=params)
-    data = resp.json()
-    object_ids = data.get("objectIDs", [])
-    return object_ids[:limit]
-
-def fetch_object_metadata(object_id):
-    resp = requests.get(f"{BASE}/objects/{object_id}")
-    return resp.json()
-
-def generate_catalog(query, output_file="generated_catalog.json"):
-    catalog = []
-    object_ids = search_met(query)
-    if not object_ids:
-        print("검색 결과 없음")
-    for oid in object_ids:
-        meta = fetch_object_metadata(oid)
-        note = explain_object(meta)
-        entry = {
-            "objectID": oid,
-            "title": meta.get("title"),
-            "artist": meta.get("artistDisplayName"),
-            "objectDate": meta.get("objectDate"),
-            "image": meta.get("primaryImage"),
-            "curator_note": note
-        }
-        catalog.append(entry)
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(catalog, f, indent=2, ensure_ascii=False)
-    print(f"Catalog saved to {output_file}")
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from src.met_api import search, get_object, get_objects, changed_since, all_object_ids, refresh_object, MAX_WORKERS, FAILED_TITLE
+from src.curator import explain_object, stored_note, can_generate
+from src.batch_notes import generate_notes, MockBatchClient
+from src.note_store import NoteStore
+from src.catalog_writer import CatalogWriter, read_catalog, read_state, write_state, tombstone, FSYNC_EVERY
+
+DEFAULT_LIMIT = 50
+
+class Progress:
+    """done/total, throughput and ETA on one stderr line."""
+    def __init__(self, total, label="objects"):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.failed = 0
+        self.start = time.monotonic()
+
+    def update(self, ok=True):
+        self.done += 1
+        self.failed += 0 if ok else 1
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        sys.stderr.write(f"\r{self.done}/{self.total} {self.label}  {rate:.1f}/s  ETA {eta:.0f}s  failed {self.failed} ")
+        if self.done == self.total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        return f"{self.done} {self.label} in {elapsed:.1f}s ({rate:.1f}/s, {self.failed} failed)"
+
+def collect_ids(queries, limit=DEFAULT_LIMIT, skip=()):
+    """objectIDs for every query in order, deduplicated across queries and against `skip`."""
+    seen, ids = set(), []
+    for q in queries:
+        found = search(q, max_results=limit)
+        new = [oid for oid in found if oid not in seen and oid not in skip]
+        seen.update(found)
+        ids.extend(new)
+        print(f"'{q}': {len(found)} results, {len(new)} new")
+    return ids
+
+def run_date():
+    # Met metadataDate filters take a day; an object changed later on the same day is picked up next time
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+def read_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def catalog_entry(oid, meta, note):
+    return {
+        "objectID": oid,
+        "title": meta.get("title"),
+        "artist": meta.get("artistDisplayName"),
+        "objectDate": meta.get("objectDate"),
+        "image": meta.get("primaryImage"),
+        "metadataDate": meta.get("metadataDate"),
+        "curator_note": note
+    }
+
+def curator_note(meta, api_key=None):
+    """Stored or freshly generated note, or None when there is none to be had (the object is then not written).
+
+    Without a backend only stored notes are used: the "enter your API key" placeholder
+    must not become a permanent note that --resume/--refresh would never replace.
+    """
+    note = stored_note(meta)
+    if note is not None or not can_generate(api_key):
+        return note
+    try:
+        return explain_object(meta, api_key=api_key, raise_errors=True)
+    except Exception as e:
+        print(f"\nobject {meta.get('objectID')}: curator note failed: {e}", file=sys.stderr)
+        return None
+
+def warn_without_backend(api_key):
+    if not can_generate(api_key):
+        print("No OPENAI_API_KEY: objects without a stored curator note are skipped until a run with a key.", file=sys.stderr)
+
+def generate_catalog(queries, output_file="generated_catalog.ndjson", api_key=None, batch=False,
+                     batch_client=None, poll_interval=30, resume=False, fsync_every=FSYNC_EVERY,
+                     limit=DEFAULT_LIMIT, max_workers=MAX_WORKERS):
+    """
+    queries: 검색어 하나 또는 여러 개. objectID는 검색어 사이에서 중복 제거됨
+    메타데이터는 src.met_api (공용 캐시 + rate limit)로 max_workers개 스레드에서 병렬로 가져옴
+    카탈로그는 NDJSON(한 줄에 작품 하나)으로 바로바로 기록되고 fsync_every개마다 디스크에 checkpoint.
+    resume=True: 이미 기록된 objectID는 건너뛰고 이어서 작성
+    batch=True: 모든 큐레이터 노트를 OpenAI Batch API 한 번으로 생성 (batch_client로 mock 가능)
+    생성 시작 날짜는 <output>.state.json에 기록되어 --refresh의 since 기본값이 됨 (resume은 기존 날짜 유지)
+    """
+    if isinstance(queries, str):
+        queries = [queries]
+    started = run_date()
+    warn_without_backend(api_key or batch_client)
+    with CatalogWriter(output_file, resume=resume, fsync_every=fsync_every) as writer:
+        object_ids = collect_ids(queries, limit, skip=writer.written_ids)
+        if not object_ids:
+            print("검색 결과 없음" if not writer.written_ids else "새로 추가할 작품 없음")
+        progress = Progress(len(object_ids))
+
+        if batch and (api_key or batch_client):
+            # batch 모드는 노트를 한 번에 만들어야 하므로 메타데이터를 먼저 모두 가져옴
+            metas = get_objects(object_ids, max_workers=max_workers, full=True)
+            batch_notes = generate_notes(
+                # failed-fetch placeholders would otherwise become paid batch lines
+                [m for m in metas if m.get("title") != FAILED_TITLE], api_key=api_key, client=batch_client, poll_interval=poll_interval,
+                progress=lambda b: print(f"batch {b.id}: {b.status}"),
+                # mock 노트는 실제 노트 저장소에 저장하지 않음
+                store=NoteStore(":memory:") if isinstance(batch_client, MockBatchClient) else None,
+            )
+            print(f"{len(batch_notes)} curator notes generated in batch")
+            for oid, meta in zip(object_ids, metas):
+                note = None if meta.get("title") == FAILED_TITLE else batch_notes.get(oid) or curator_note(meta, api_key)
+                if note is None:
+                    progress.update(ok=False)  # not written, so --resume retries it
+                    continue
+                writer.write(catalog_entry(oid, meta, note))
+                progress.update()
+        else:
+            def build(oid):
+                meta = get_object(oid, full=True)
+                if meta.get("title") == FAILED_TITLE:
+                    return None  # not written, so --resume retries it
+                note = curator_note(meta, api_key)
+                return catalog_entry(oid, meta, note) if note is not None else None
+
+            # 작은 묶음 단위로 병렬 처리 → 메모리 사용량 일정, 기록은 메인 스레드에서만
+            chunk = max(1, max_workers) * 8
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                for i in range(0, len(object_ids), chunk):
+                    for entry in pool.map(build, object_ids[i:i + chunk]):
+                        if entry is not None:
+                            writer.write(entry)
+                        progress.update(ok=entry is not None)
+
+    if not (resume and read_state(output_file).get("refreshedAt")):
+        write_state(output_file, refreshedAt=started)
+    skipped = len(writer.written_ids) - writer.count
+    print(f"Catalog saved to {output_file} ({writer.count} new, {skipped} already present); {progress.summary()}")
+
+def refresh_catalog(output_file, queries=(), since=None, api_key=None, limit=DEFAULT_LIMIT,
+                    max_workers=MAX_WORKERS, fsync_every=FSYNC_EVERY):
+    """
+    증분 갱신: Met의 metadataDate 기준으로 바뀐 작품만 다시 가져오고 노트를 재생성
+    - 변경 목록은 /objects?metadataDate=since 한 번으로 조회
+      (since 기본값: <output>.state.json의 마지막 생성/갱신 날짜, 없으면 카탈로그의 가장 최근 metadataDate)
+    - metadataDate가 없는 예전 항목은 변경된 것으로 간주
+    - 전체 objectID 목록(/objects 한 번)에 없는 작품은 다시 확인해 404면 tombstone으로 남김
+    - queries가 주어지면 새로 검색된 작품도 추가
+    카탈로그는 임시 파일에 다시 쓴 뒤 os.replace로 교체되므로 중간에 실패해도 원본은 그대로
+    """
+    stored, deleted = {}, set()  # objectID -> metadataDate
+    for e in read_catalog(output_file, include_deleted=True):
+        if e.get("deleted"):
+            deleted.add(e["objectID"])
+        else:
+            stored[e["objectID"]] = e.get("metadataDate")
+    started = run_date()
+    warn_without_backend(api_key)
+    if since is None:
+        since = read_state(output_file).get("refreshedAt") or max((d[:10] for d in stored.values() if d), default=None)
+
+    changed = {oid for oid, d in stored.items() if not d}
+    if since is not None:
+        changed |= changed_since(since) & stored.keys()
+    # removed objects never show up as changed; an empty list means a bad response, not an empty Met
+    listed = all_object_ids()
+    missing = stored.keys() - listed if listed else set()
+    changed |= missing  # refetched first: only a 404 turns them into tombstones
+    new_ids = collect_ids(queries, limit, skip=stored.keys() | deleted) if queries else []
+    todo = sorted(changed) + new_ids
+    print(f"since {since}: {len(changed)} changed ({len(missing)} no longer listed), {len(new_ids)} new, "
+          f"{len(stored) - len(changed)} untouched")
+
+    def build(oid):
+        try:
+            meta = refresh_object(oid)
+        except Exception:
+            return oid, None  # keep the old entry; the next refresh retries it
+        if meta is None:
+            return oid, tombstone(oid)
+        note = curator_note(meta, api_key)
+        if note is None:
+            return oid, None  # keep the old entry (and note); the next refresh retries it
+        return oid, catalog_entry(oid, meta, note)
+
+    progress = Progress(len(todo))
+    updates = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for oid, entry in pool.map(build, todo):
+            if entry is not None:
+                updates[oid] = entry
+            progress.update(ok=entry is not None)
+
+    tmp_file = output_file + ".tmp"
+    removed = sum(1 for e in updates.values() if e.get("deleted"))
+    with CatalogWriter(tmp_file, fsync_every=fsync_every) as writer:
+        for e in read_catalog(output_file, include_deleted=True):
+            writer.write(updates.pop(e["objectID"], e))
+        for entry in updates.values():
+            if not entry.get("deleted"):
+                writer.write(entry)
+    os.replace(tmp_file, output_file)
+    write_state(output_file, refreshedAt=started)
+    print(f"Catalog refreshed: {output_file} ({removed} removed); {progress.summary()}")
 
 if __name__ == "__main__":
-    generate_catalog("sunflowers")
+    parser = argparse.ArgumentParser(description="Build a curator-note catalog from The Met")
+    parser.add_argument("queries", nargs="*", help="search terms (default: sunflowers)")
+    parser.add_argument("--query-file", help="file with one search term per line (# comments allowed)")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="max objects per query")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="parallel metadata/note workers")
+    parser.add_argument("--output", default="generated_catalog.ndjson", help="NDJSON file, one object per line")
+    parser.add_argument("--resume", action="store_true", help="append to --output, skipping objectIDs already in it")
+    parser.add_argument("--refresh", action="store_true",
+                        help="incrementally update --output: refetch objects whose metadataDate changed, add new query results, tombstone removed objects")
+    parser.add_argument("--since", help="with --refresh: YYYY-MM-DD to look for changes from (default: date of the last build/refresh)")
+    parser.add_argument("--fsync-every", type=int, default=FSYNC_EVERY, help="checkpoint (flush + fsync) every N entries")
+    parser.add_argument("--batch", action="store_true", help="generate notes with one OpenAI Batch API job")
+    parser.add_argument("--mock-batch", action="store_true", help="use the local mock batch endpoint (no API key needed)")
+    parser.add_argument("--poll-interval", type=float, default=30)
+    args = parser.parse_args()
+    queries = list(args.queries)
+    if args.query_file:
+        queries += read_queries(args.query_file)
+
+    if args.refresh:
+        refresh_catalog(
+            args.output, queries, since=args.since, api_key=os.environ.get("OPENAI_API_KEY"),
+            limit=args.limit, max_workers=args.workers, fsync_every=args.fsync_every,
+        )
+        sys.exit(0)
+
+    generate_catalog(
+        queries or ["sunflowers"],
+        output_file=args.output,
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        batch=args.batch or args.mock_batch,
+        batch_client=MockBatchClient() if args.mock_batch else None,
+        poll_interval=0 if args.mock_batch else args.poll_interval,
+        resume=args.resume,
+        fsync_every=args.fsync_every,
+        limit=args.limit,
+        max_workers=args.workers,
+    )
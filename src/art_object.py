@@ -0,0 +1,81 @@
+# src/art_object.py
+"""
+Compact, read-only record for the Met object fields the apps actually use.
+
+A full Met JSON payload has 60+ keys (constituents, tags, additionalImages...);
+ArtObject keeps only FIELDS in __slots__ and interns the highly repetitive
+values (department, culture, medium...), so tens of thousands of objects fit
+in a small memory budget. It behaves like a read-only dict (`meta.get(...)`,
+`meta["title"]`, `pd.DataFrame(list_of_records)`), so existing callers work
+unchanged. Use `get_object(id, full=True)` when you need the whole payload.
+"""
+import sys
+from collections.abc import Mapping
+
+FIELDS = (
+    "objectID", "title", "artistDisplayName", "artistDisplayBio", "artistNationality",
+    "objectDate", "objectBeginDate", "objectEndDate", "medium", "dimensions", "creditLine",
+    "culture", "country", "city", "department", "classification",
+    "primaryImage", "primaryImageSmall", "objectURL", "metadataDate",
+)
+INTERNED = frozenset((
+    "artistDisplayName", "artistNationality", "medium", "culture", "country", "city",
+    "department", "classification",
+))
+# title of the stand-in src.met_api returns for an object it could not load
+FAILED_TITLE = "(failed to fetch)"
+
+
+class ArtObject(Mapping):
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for name in FIELDS:
+            value = values.get(name)
+            if name in INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_meta(cls, meta):
+        """Project a Met JSON dict (or another ArtObject) onto FIELDS; empty strings become None."""
+        return cls(**{k: (meta.get(k) if meta.get(k) != "" else None) for k in FIELDS})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ArtObject is read-only")
+
+    def __reduce__(self):
+        # the default protocol restores slots through __setattr__, which is blocked;
+        # rebuild through from_meta so pickle, copy.deepcopy and st.cache_data work
+        return (ArtObject.from_meta, (self.to_dict(),))
+
+    # Mapping interface: only fields that have a value are visible as keys,
+    # so meta.get("culture", "Unknown") behaves as it did with the raw dict.
+    def __getitem__(self, key):
+        if key in FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (k for k in FIELDS if getattr(self, k) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"ArtObject(objectID={self.objectID!r}, title={self.title!r})"
+
+    def to_dict(self):
+        """Plain dict of the set fields (e.g. for json.dumps, which does not accept Mappings)."""
+        return dict(self)
+
+    def nbytes(self):
+        """Approximate memory footprint; interned values are shared, so they are not counted."""
+        size = sys.getsizeof(self)
+        for name in FIELDS:
+            value = getattr(self, name)
+            if value is not None and name not in INTERNED:
+                size += sys.getsizeof(value)
+        return size
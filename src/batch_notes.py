@@ -0,0 +1,158 @@
+# src/batch_notes.py
+"""
+Offline curator-note generation through the OpenAI Batch API.
+
+Instead of one chat completion per object, all missing notes are written as
+one JSONL file (one /v1/chat/completions request per line), submitted as a
+single batch, polled until finished, and the results are written into the
+curator note store. Batch requests are billed at a discount and do not
+count against interactive rate limits, which suits catalog builds.
+
+`MockBatchClient` implements the small part of the client surface used here
+(files.create / files.content / batches.create / batches.retrieve) with
+deterministic local notes, so the pipeline can be exercised without a key.
+"""
+import json
+import time
+import itertools
+from types import SimpleNamespace
+from src import curator
+from src.openai_clients import get_client
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_requests(metas, store=None):
+    """(jsonl_lines, key -> (objectID, prompt_version, similarity text)) for every meta without a stored note."""
+    store = curator.note_store() if store is None else store
+    lines, pending = [], {}
+    for meta in metas:
+        if not meta:
+            continue
+        key, messages, version = curator._request(meta)
+        if key in pending or store.get(key) is not None:
+            continue
+        pending[key] = (meta.get("objectID"), version, curator._similarity_text(meta))
+        lines.append(json.dumps({
+            "custom_id": key,
+            "method": "POST",
+            "url": ENDPOINT,
+            "body": {
+                "model": curator.MODEL,
+                "messages": messages,
+                "temperature": curator.TEMPERATURE,
+                "max_tokens": curator.MAX_TOKENS,
+            },
+        }, ensure_ascii=False))
+    return lines, pending
+
+
+def submit(client, lines):
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    upload = client.files.create(file=("curator_notes.jsonl", payload), purpose="batch")
+    batch = client.batches.create(input_file_id=upload.id, endpoint=ENDPOINT, completion_window="24h")
+    return batch.id
+
+
+def wait(client, batch_id, poll_interval=30, timeout=24 * 3600, progress=None):
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if progress:
+            progress(batch)
+        if batch.status in TERMINAL:
+            return batch
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"batch {batch_id} still {batch.status} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def parse_results(text):
+    """custom_id -> note text for every successful line of a batch output file."""
+    notes = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        if row.get("error") or response.get("status_code") != 200:
+            continue
+        try:
+            notes[row["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            continue
+    return notes
+
+
+def generate_notes(metas, api_key=None, client=None, poll_interval=30, timeout=24 * 3600, progress=None,
+                   store=None):
+    """Fill the note store for `metas` with one batch request; returns {objectID: note} for new notes.
+
+    `store` defaults to the curator note store; pass a throwaway NoteStore(":memory:")
+    together with MockBatchClient so mock notes never reach the real store.
+    """
+    store = curator.note_store() if store is None else store
+    lines, pending = build_requests(metas, store)
+    if not lines:
+        return {}
+    client = client or get_client(api_key)
+    batch = wait(client, submit(client, lines), poll_interval, timeout, progress)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"batch {batch.id} ended with status {batch.status}")
+    results = parse_results(client.files.content(batch.output_file_id).text)
+
+    written = {}
+    for key, note in results.items():
+        if key in pending and note:
+            object_id, version, meta_str = pending[key]
+            store.put(key, note, object_id=object_id, model=curator.MODEL, prompt_version=version, meta_str=meta_str)
+            written[object_id] = note
+    return written
+
+
+class MockBatchClient:
+    """In-process stand-in for the OpenAI Files + Batches endpoints."""
+
+    def __init__(self, steps_until_done=1):
+        self._files = {}
+        self._batches = {}
+        self._ids = itertools.count(1)
+        self._steps = steps_until_done
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose):
+        data = file[1] if isinstance(file, tuple) else file.read()
+        file_id = f"file-mock-{next(self._ids)}"
+        self._files[file_id] = data.decode("utf-8") if isinstance(data, bytes) else data
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def _file_content(self, file_id):
+        return SimpleNamespace(text=self._files[file_id])
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-mock-{next(self._ids)}"
+        self._batches[batch_id] = {"input": input_file_id, "polls": 0, "output": None}
+        return self._retrieve_batch(batch_id, count=False)
+
+    def _retrieve_batch(self, batch_id, count=True):
+        state = self._batches[batch_id]
+        if count:
+            state["polls"] += 1
+        if state["polls"] >= self._steps and state["output"] is None:
+            out = []
+            for line in self._files[state["input"]].splitlines():
+                req = json.loads(line)
+                user = req["body"]["messages"][-1]["content"]
+                title = next((l.split(":", 1)[1].strip() for l in user.splitlines() if l.startswith("Title:")), "Untitled")
+                note = f"[mock curator note] {title}"
+                out.append(json.dumps({
+                    "custom_id": req["custom_id"],
+                    "response": {"status_code": 200, "body": {"choices": [{"message": {"content": note}}]}},
+                    "error": None,
+                }))
+            state["output"] = f"file-mock-{next(self._ids)}"
+            self._files[state["output"]] = "\n".join(out) + "\n"
+        status = "completed" if state["output"] else "in_progress"
+        return SimpleNamespace(id=batch_id, status=status, output_file_id=state["output"])
@@ -0,0 +1,262 @@
+# src/catalog_db.py
+"""
+Local catalog of Met objects and uploaded works (SQLite, WAL).
+
+One row per work, keyed "met:<objectID>" or "upload:<sha256>", with
+indexes on objectID, artist, begin/end year, country, medium and source, so
+questions like "works by artist X between 1870 and 1890" are answered
+without loading the whole catalog:
+
+    catalog_db().query(artist="Claude Monet", year_from=1870, year_to=1890)
+    catalog_db().counts("country", source="met")
+
+Fill it from Met metadata (`upsert_met`), the upload store (`import_uploads`)
+or existing catalog files (`import_json`: the JSON array format or
+generate_catalog.py NDJSON):
+
+    python -m src.catalog_db generated_catalog.ndjson data/generated_catalog.json --uploads
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from src import upload_store
+from src.art_object import FAILED_TITLE
+from src.catalog_writer import read_catalog
+
+DEFAULT_PATH = os.environ.get("CATALOG_DB_PATH", os.path.join("data", "catalog.sqlite"))
+SOURCES = ("met", "upload")
+COLUMNS = (
+    "uid", "object_id", "source", "title", "artist", "object_date", "begin_year", "end_year",
+    "country", "medium", "image", "image_sha", "description", "curator_note", "metadata_date", "updated_at",
+)
+COUNTABLE = ("artist", "country", "medium", "source", "begin_year")
+
+_YEAR_RE = re.compile(r"\b(\d{3,4})\b")
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _years(begin, end, object_date):
+    """(begin, end) years, falling back to the first year mentioned in object_date."""
+    begin, end = _to_int(begin), _to_int(end)
+    if begin is None and end is None and object_date:
+        m = _YEAR_RE.search(str(object_date))
+        if m:
+            begin = end = int(m.group(1))
+    return begin, end if end is not None else begin
+
+
+class CatalogDB:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS works ("
+            " uid TEXT PRIMARY KEY,"
+            " object_id INTEGER,"
+            " source TEXT NOT NULL,"
+            " title TEXT, artist TEXT, object_date TEXT, begin_year INTEGER, end_year INTEGER,"
+            " country TEXT, medium TEXT, image TEXT, image_sha TEXT, description TEXT,"
+            " curator_note TEXT, metadata_date TEXT, updated_at REAL NOT NULL)"
+        )
+        for name, cols in (
+            ("object_id", "object_id"), ("artist", "artist"), ("years", "begin_year, end_year"),
+            ("end_year", "end_year"), ("country", "country"), ("medium", "medium"), ("source", "source"),
+        ):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_works_{name} ON works({cols})")
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM works").fetchone()[0]
+
+    # -------- writes --------
+
+    def _upsert(self, rows):
+        rows = list(rows)
+        if not rows:
+            return 0
+        now = time.time()
+        # a column the caller did not supply (None) keeps its stored value, e.g. curator_note
+        # when Met metadata is re-imported without notes
+        update = ", ".join(f"{c} = COALESCE(excluded.{c}, works.{c})" for c in COLUMNS if c != "uid")
+        insert = (
+            f"INSERT INTO works ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+            f" ON CONFLICT(uid) DO UPDATE SET {update}"
+        )
+        values = [[row.get(c) if c != "updated_at" else now for c in COLUMNS] for row in rows]
+        with self._lock:
+            self._conn.executemany(insert, values)
+            self._conn.commit()
+        return len(rows)
+
+    @staticmethod
+    def met_row(meta, country=None, note=None):
+        begin, end = _years(meta.get("objectBeginDate"), meta.get("objectEndDate"), meta.get("objectDate"))
+        oid = meta.get("objectID")
+        return {
+            "uid": f"met:{oid}", "object_id": oid, "source": "met",
+            "title": meta.get("title"), "artist": meta.get("artistDisplayName") or meta.get("artist") or None,
+            "object_date": meta.get("objectDate"), "begin_year": begin, "end_year": end,
+            "country": country or meta.get("country") or None, "medium": meta.get("medium") or None,
+            "image": meta.get("primaryImageSmall") or meta.get("primaryImage") or meta.get("image"),
+            "curator_note": note or meta.get("curator_note"), "metadata_date": meta.get("metadataDate"),
+        }
+
+    def upsert_met(self, metas, country_of=None):
+        """Insert/refresh Met objects; `country_of(meta)` can derive a country when the Met leaves it blank.
+
+        Failed-fetch placeholders (src.met_api) are skipped: they are not works and
+        must not overwrite a stored row.
+        """
+        return self._upsert(
+            self.met_row(m, country=country_of(m) if country_of else None)
+            for m in metas if m and m.get("objectID") is not None and m.get("title") != FAILED_TITLE
+        )
+
+    @staticmethod
+    def upload_row(record):
+        return {
+            "uid": f"upload:{record['sha256']}", "source": "upload",
+            "title": record.get("title"), "artist": record.get("artist"),
+            "image": upload_store.blob_path(record["sha256"], record.get("ext", "png")),
+            "image_sha": record["sha256"], "description": record.get("description"),
+        }
+
+    def upsert_upload(self, record):
+        return self._upsert([self.upload_row(record)])
+
+    def delete(self, uid):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM works WHERE uid = ?", (uid,))
+            self._conn.commit()
+            return cur.rowcount
+
+    # -------- importers --------
+
+    def import_json(self, path, batch_size=1000):
+        """Import a catalog file: a JSON array or generate_catalog.py NDJSON (tombstones delete). Returns rows written."""
+        with open(path, "r", encoding="utf-8") as f:
+            head = f.read(64).lstrip()[:1]
+        if head == "[":
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        else:
+            entries = read_catalog(path, include_deleted=True)
+
+        count, batch = 0, []
+        for e in entries:
+            if not isinstance(e, dict):
+                continue
+            if e.get("image_bytes"):
+                continue  # legacy uploads: see upload_store.import_legacy_json / import_uploads
+            if e.get("deleted"):
+                self.delete(f"met:{e.get('objectID')}")
+                continue
+            if e.get("objectID") is None or e.get("title") == FAILED_TITLE:
+                continue
+            batch.append(self.met_row(e))
+            if len(batch) >= batch_size:
+                count += self._upsert(batch)
+                batch = []
+        return count + self._upsert(batch)
+
+    def import_uploads(self):
+        """Mirror the upload store index (latest record per image wins)."""
+        return self._upsert(self.upload_row(r) for r in upload_store.iter_uploads())
+
+    # -------- reads --------
+
+    @staticmethod
+    def _where(ids=None, artist=None, year_from=None, year_to=None, country=None, medium=None, source=None):
+        clauses, params = [], []
+        if ids is not None:
+            ids = [int(i) for i in ids]
+            clauses.append(f"object_id IN ({', '.join('?' * len(ids))})" if ids else "0")
+            params += ids
+        for col, value in (("artist", artist), ("country", country), ("medium", medium), ("source", source)):
+            if value is not None:
+                clauses.append(f"{col} = ?")
+                params.append(value)
+        # a work matches a year range when its [begin, end] span overlaps it
+        if year_from is not None:
+            clauses.append("end_year >= ?")
+            params.append(int(year_from))
+        if year_to is not None:
+            clauses.append("begin_year <= ?")
+            params.append(int(year_to))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit=None, offset=0, order_by="begin_year", **filters):
+        """Works matching the filters (ids, artist, year_from, year_to, country, medium, source) as dicts."""
+        if order_by not in COLUMNS:
+            raise ValueError(f"cannot order by {order_by!r}")
+        where, params = self._where(**filters)
+        sql = f"SELECT * FROM works{where} ORDER BY {order_by} IS NULL, {order_by}, uid LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [-1 if limit is None else int(limit), int(offset)]).fetchall()
+        return [dict(r) for r in rows]
+
+    def counts(self, column, **filters):
+        """[(value, n), ...] for `column` over the matching works, most common first."""
+        if column not in COUNTABLE:
+            raise ValueError(f"cannot count by {column!r}")
+        where, params = self._where(**filters)
+        sql = f"SELECT COALESCE({column}, 'Unknown'), COUNT(*) FROM works{where} GROUP BY 1 ORDER BY 2 DESC"
+        with self._lock:
+            return [tuple(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def artists(self, source=None):
+        where, params = self._where(source=source)
+        sql = f"SELECT DISTINCT artist FROM works{where} {'AND' if where else 'WHERE'} artist IS NOT NULL ORDER BY artist"
+        with self._lock:
+            return [r[0] for r in self._conn.execute(sql, params).fetchall()]
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def catalog_db():
+    """Process-wide catalog (created lazily)."""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = CatalogDB()
+    return _db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import catalog JSON / NDJSON files into the SQLite catalog")
+    parser.add_argument("paths", nargs="*", help="generated_catalog.json (array) or generate_catalog.py NDJSON files")
+    parser.add_argument("--uploads", action="store_true", help="also import the upload store index")
+    parser.add_argument("--db", default=DEFAULT_PATH, help=f"SQLite file (default: {DEFAULT_PATH})")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    db = CatalogDB(args.db)
+    for path in args.paths:
+        print(f"  {path}: {db.import_json(path)} works", file=sys.stderr)
+    if args.uploads:
+        print(f"  uploads: {db.import_uploads()} works", file=sys.stderr)
+    print(f"{len(db)} works in {args.db} ({time.time() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# src/catalog_writer.py
+"""
+Append-only NDJSON catalog files (one JSON object per line).
+
+Entries are written as they are produced, so memory stays flat however large
+the catalog gets, and every `fsync_every` entries the file is flushed and
+fsynced: a crash loses at most the entries since the last checkpoint. With
+resume=True an existing file is scanned for the objectIDs it already holds
+(a torn last line from a crash is cut off) and new entries are appended.
+
+Objects removed from the source are kept as tombstones,
+{"objectID": ..., "deleted": true, "deletedAt": ...}, which readers skip
+unless include_deleted=True.
+
+A small sidecar, <catalog>.state.json, records when the catalog was last
+built or refreshed (`read_state` / `write_state`).
+"""
+import os
+import json
+import time
+
+FSYNC_EVERY = 25
+
+
+def tombstone(object_id):
+    return {"objectID": object_id, "deleted": True, "deletedAt": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def read_catalog(path, include_deleted=False):
+    """Yield catalog entries from an NDJSON file, skipping blank or torn lines (and tombstones)."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if include_deleted or not entry.get("deleted"):
+                yield entry
+
+
+def state_path(path):
+    return path + ".state.json"
+
+
+def read_state(path):
+    """The catalog's sidecar state ({} when missing or unreadable)."""
+    try:
+        with open(state_path(path), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def write_state(path, **fields):
+    state = dict(read_state(path), **fields)
+    tmp = state_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, state_path(path))
+    return state
+
+
+class CatalogWriter:
+    def __init__(self, path, resume=False, fsync_every=FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.written_ids = set()
+        self.count = 0
+        self._since_sync = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if resume and os.path.exists(path):
+            self._truncate_torn_tail()
+            self.written_ids = {e.get("objectID") for e in read_catalog(path, include_deleted=True)}
+            self._f = open(path, "a", encoding="utf-8")
+        else:
+            self._f = open(path, "w", encoding="utf-8")
+
+    def _truncate_torn_tail(self):
+        # a crash mid-write can leave a partial last line; drop it so appends stay parseable
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def __contains__(self, object_id):
+        return object_id in self.written_ids
+
+    def write(self, entry):
+        self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.written_ids.add(entry.get("objectID"))
+        self.count += 1
+        self._since_sync += 1
+        if self._since_sync >= self.fsync_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._since_sync = 0
+
+    def close(self):
+        if not self._f.closed:
+            self.checkpoint()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
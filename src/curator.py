@@ -1,15 +1,90 @@
-from openai import OpenAI
-from functools import lru_cache
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from src.llm_backends import default_chain, FakeBackend
+from src.singleflight import SingleFlight
+from src.note_store import NoteStore, note_key
+from src.prompts import get_prompt, DEFAULT_BUDGET_TOKENS
+from src.similarity import SimilarityIndex
+from src import metrics
+from src import usage_ledger
 
-SYSTEM_PROMPT = (
-    "You are a professional museum curator. Your tone is polished, evocative, and authoritative yet accessible."
-)
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.3
+MAX_TOKENS = 400
+MAX_WORKERS = 5
+# Prompts live in prompts/curator_prompts.md; None = last version in the file.
+# Notes are keyed by the rendered prompt + version, so a new version regenerates them.
+PROMPT_VERSION = os.environ.get("CURATOR_PROMPT_VERSION") or None
+PROMPT_BUDGET_TOKENS = DEFAULT_BUDGET_TOKENS
+# Reuse the stored note of a near-identical artwork (same prompt version) instead of
+# calling the LLM; CURATOR_SIMILAR_NOTES=0 disables it.
+SIMILAR_NOTES = os.environ.get("CURATOR_SIMILAR_NOTES", "1") != "0"
+SIMILARITY_THRESHOLD = float(os.environ.get("CURATOR_SIMILARITY_THRESHOLD", "0.9"))
 
-USER_TEMPLATE = (
-    "Write a 150-220 word curator note about the following artwork. "
-    "Include: (1) brief context, (2) visual analysis, (3) interpretive insight, (4) a viewing tip.\n"
-    "Metadata: {meta}\n"
-)
+_flight = SingleFlight()
+_store = None
+_store_lock = threading.Lock()
+_backend = None  # set_backend() override; otherwise default_chain(api_key)
+_similar = None  # SimilarityIndex over stored notes, built on first use
+_similar_lock = threading.Lock()
+
+def set_backend(backend):
+    """Use `backend` (e.g. llm_backends.FakeBackend() or a FallbackChain) for every note; None restores the default."""
+    global _backend
+    _backend = backend
+
+def _backend_for(api_key):
+    return _backend if _backend is not None else default_chain(api_key, model=MODEL)
+
+def _primary_model():
+    """Model of the first backend tried; notes are looked up under its key."""
+    return _backend.model if _backend is not None else MODEL
+
+def _keeps_notes(backend):
+    # FakeBackend output is a placeholder and must never become a stored note
+    return not isinstance(backend, FakeBackend)
+
+def can_generate(api_key=None):
+    """True when a note can be generated (an API key or a set_backend() override)."""
+    return bool(api_key) or _backend is not None
+
+def note_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = NoteStore()
+    return _store
+
+def invalidate_notes(object_id=None):
+    """Forget stored notes for one object, or all of them."""
+    global _similar
+    removed = note_store().invalidate(object_id)
+    with _similar_lock:
+        _similar = None  # rebuilt from what is left
+    return removed
+
+def similarity_index():
+    global _similar
+    if _similar is None:
+        store = note_store()
+        with _similar_lock:
+            if _similar is None:
+                index = SimilarityIndex(SIMILARITY_THRESHOLD)
+                # signatures come precomputed from the store, so this is a scan, not a rehash
+                for key, meta_str, version, model, signature in store.similarity_rows():
+                    index.add(key, meta_str, (version, model, meta_str), signature=signature)
+                _similar = index
+    return _similar
+
+def stored_note(meta):
+    """Previously generated note for `meta`, or None (never calls the API)."""
+    if not meta:
+        return None
+    key, _, _ = _request(meta, model=_primary_model())
+    return note_store().get(key)
 
 def _meta_to_str(meta):
     fields = ["title", "artistDisplayName", "objectDate", "medium", "dimensions", "creditLine"]
@@ -18,39 +93,200 @@ def _meta_to_str(meta):
         parts.append(f"objectID: {meta['objectID']}")
     return "; ".join(parts)
 
-@lru_cache(maxsize=256)
-def _call_openai_for_object(object_id, meta_str, api_key):
-    if not api_key:
+def _similarity_text(meta):
+    # objectID is unique per artwork and would only dilute the comparison
+    return _meta_to_str({k: v for k, v in meta.items() if k != "objectID"})
+
+def _parse_meta_str(meta_str):
+    fields = {}
+    for part in meta_str.split("; "):
+        name, sep, value = part.partition(": ")
+        if sep:
+            fields[name] = value
+    return fields
+
+def _similar_note(meta, version, model):
+    """Adapted note of a near-duplicate artwork already in the store (same prompt version and model), or None."""
+    if not SIMILAR_NOTES:
+        return None
+    text = _similarity_text(meta)
+    match = similarity_index().query(text, accept=lambda payload: payload[:2] == (version, model))
+    if match is None:
+        return None
+    donor_key, _, (_, _, donor_text) = match
+    note = note_store().get(donor_key)
+    if note is None:
+        return None
+    # swap in this artwork's own title/date where the donor note quotes them verbatim
+    donor = _parse_meta_str(donor_text)
+    for field in ("title", "objectDate"):
+        old, new = donor.get(field), meta.get(field)
+        if old and new and old != new:
+            note = note.replace(old, str(new))
+    return note
+
+def _remember(key, note, meta, version, model):
+    text = _similarity_text(meta)
+    note_store().put(key, note, object_id=meta.get("objectID"), model=model, prompt_version=version, meta_str=text)
+    if _similar is not None:
+        _similar.add(key, text, (version, model, text))
+
+def _key_for(messages, model, version):
+    return note_key(messages[0]["content"] + "\n" + messages[1]["content"], model, TEMPERATURE, version)
+
+def _request(meta, extra="", model=MODEL):
+    """(note_key, messages, prompt_version) for `meta` under the active prompt template."""
+    template = get_prompt(PROMPT_VERSION)
+    system, user = template.render(meta, budget_tokens=PROMPT_BUDGET_TOKENS, extra=extra)
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user}
+    ]
+    return _key_for(messages, model, template.version), messages, template.version
+
+def _placeholder_note(meta):
+    # API 키가 없으면 안내만 출력
+    title = meta.get("title", "Untitled")
+    artist = meta.get("artistDisplayName", "Unknown Artist")
+    date = meta.get("objectDate", "")
+    return f"{title} — {artist} ({date}). [Enter your OpenAI API key to generate a full curator note.]"
+
+def _count_stored(result, model):
+    """A note served without an LLM call (hit / similar): metrics plus a zero-token ledger row."""
+    metrics.inc("cache_requests_total", cache="curator_notes", result=result)
+    usage_ledger.record("note_store", model, cache=result)
+
+def _complete(messages, api_key):
+    """(note, backend that wrote it)."""
+    return _backend_for(api_key).complete_with_source(messages, temperature=TEMPERATURE, max_tokens=MAX_TOKENS)
+
+def _keep(key, note, meta, messages, version, backend, similar=True):
+    """Store a freshly generated note under the model that actually wrote it."""
+    if not note or not _keeps_notes(backend):
+        return
+    if backend.model != _primary_model():
+        key = _key_for(messages, backend.model, version)
+    if similar:
+        _remember(key, note, meta, version, backend.model)
+    else:
+        note_store().put(key, note, object_id=meta.get("objectID"), model=backend.model, prompt_version=version)
+
+def _note_for_object(meta, key, messages, version, api_key, similar=True):
+    if not can_generate(api_key):
         return None
-    client = OpenAI(api_key=api_key)
+    model = _primary_model()
+    note = note_store().get(key)
+    if note is not None:
+        _count_stored("hit", model)
+        return note
+    note = _similar_note(meta, version, model) if similar else None
+    if note is not None:
+        _count_stored("similar", model)
+        _remember(key, note, meta, version, model)
+        return note
+    metrics.inc("cache_requests_total", cache="curator_notes", result="miss")
+    note, backend = _complete(messages, api_key)
+    _keep(key, note, meta, messages, version, backend, similar)
+    return note
+
+def _explain(meta, api_key, extra="", raise_errors=False):
+    key, messages, version = _request(meta, extra, model=_primary_model())
+    # identical concurrent requests (e.g. many users on the same artwork) share one call;
+    # comparison notes depend on the other selections, so they never borrow a similar note
+    feature = "curator_compare" if extra else "curator_note"
     try:
-        res = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": USER_TEMPLATE.format(meta=meta_str)}
-            ],
-            temperature=0.3,
-            max_tokens=400
-        )
-        return res.choices[0].message.content
+        with metrics.timer("curator_note_seconds"), usage_ledger.usage_context(feature=feature, override=False):
+            result = _flight.do(key, _note_for_object, meta, key, messages, version, api_key, not extra)
     except Exception as e:
-        return f"OpenAI request failed: {e}"
+        if raise_errors:
+            raise
+        return f"Curator note request failed: {e}"
+    return result if result is not None else "No LLM backend configured."
 
-def explain_object(meta, api_key=None):
+def explain_object(meta, api_key=None, raise_errors=False):
+    """Curator note for `meta`. A failed LLM request is described in the returned text,
+    or raised with raise_errors=True (for callers that keep or count the result)."""
     if not meta:
         return "No metadata provided."
-    object_id = meta.get("objectID")
-    meta_str = _meta_to_str(meta)
-
-    if not api_key:
-        # API 키가 없으면 안내만 출력
-        title = meta.get("title", "Untitled")
-        artist = meta.get("artistDisplayName", "Unknown Artist")
-        date = meta.get("objectDate", "")
-        return f"{title} — {artist} ({date}). [Enter your OpenAI API key to generate a full curator note.]"
-
-    result = _call_openai_for_object(object_id, meta_str, api_key)
-    if result is None:
-        return "OpenAI client not configured correctly."
-    return result
+    if not can_generate(api_key):
+        return _placeholder_note(meta)
+    return _explain(meta, api_key, raise_errors=raise_errors)
+
+def _compare_context(meta, others):
+    refs = [f"{o.get('title', 'Untitled')} — {o.get('artistDisplayName', 'Unknown Artist')}" for o in others if o is not meta]
+    if not refs:
+        return ""
+    return "\nAlso relate it briefly to these other selected artworks: " + "; ".join(refs)
+
+def explain_objects(metas, api_key=None, compare=True, max_workers=MAX_WORKERS):
+    """Curator notes for several artworks, generated concurrently (order preserved).
+
+    With compare=True each note also relates its artwork to the others in `metas`.
+    """
+    metas = list(metas)
+    if not can_generate(api_key):
+        return [explain_object(m) for m in metas]
+
+    def one(meta):
+        if not meta:
+            return "No metadata provided."
+        return _explain(meta, api_key, _compare_context(meta, metas) if compare else "")
+
+    if len(metas) <= 1:
+        return [one(m) for m in metas]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(metas))) as pool:
+        # carry the caller's usage labels (session) into the worker threads
+        futures = [pool.submit(contextvars.copy_context().run, one, m) for m in metas]
+        return [f.result() for f in futures]
+
+def stream_explain_object(meta, api_key=None):
+    """Like explain_object, but yields the note in chunks as the model produces them.
+
+    Stored notes, and notes another call (e.g. a prefetch) is already generating,
+    are yielded in one piece; a freshly streamed note is written to
+    the note store once the stream completes. Suitable for st.write_stream.
+    """
+    if not meta:
+        yield "No metadata provided."
+        return
+    if not can_generate(api_key):
+        yield _placeholder_note(meta)
+        return
+    yield from usage_ledger.labelled_iter(_stream_note(meta, api_key), feature="curator_note", override=False)
+
+def _stream_note(meta, api_key):
+    model = _primary_model()
+    key, messages, version = _request(meta, model=model)
+    note = note_store().get(key)
+    if note is not None:
+        _count_stored("hit", model)
+        yield note
+        return
+    note = _similar_note(meta, version, model)
+    if note is not None:
+        _count_stored("similar", model)
+        _remember(key, note, meta, version, model)
+        yield note
+        return
+    # a prefetch or explain_object() call already generating this note: wait for it instead
+    # of paying for a second completion; if it failed, stream our own
+    try:
+        joined, note = _flight.join(key)
+    except Exception:
+        joined, note = False, None
+    if joined and note:
+        _count_stored("shared", model)
+        yield note
+        return
+    metrics.inc("cache_requests_total", cache="curator_notes", result="miss")
+
+    parts, backend = [], None
+    try:
+        for delta, backend in _backend_for(api_key).stream_with_source(messages, temperature=TEMPERATURE, max_tokens=MAX_TOKENS):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        yield f"Curator note request failed: {e}"
+        return
+    if backend is not None:
+        _keep(key, "".join(parts), meta, messages, version, backend)
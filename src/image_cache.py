@@ -0,0 +1,168 @@
+# src/image_cache.py
+"""
+On-disk cache for Met image URLs (primaryImageSmall / primaryImage).
+
+Each URL is downloaded once and stored under data/cache/images keyed by the
+SHA-256 of the URL. Resized variants (per display width) are stored next to
+it as WebP (JPEG if Pillow lacks WebP support). After REVALIDATE_AFTER
+seconds the original is revalidated with a conditional GET
+(If-None-Match / If-Modified-Since); a 304 keeps every variant.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from src.met_api import keepalive_session
+
+CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join("data", "cache", "images"))
+REVALIDATE_AFTER = 24 * 3600
+REQUEST_TIMEOUT = 15
+QUALITY = 80
+MAX_WORKERS = 8
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="image-cache")
+_session = None  # image downloads get their own connection pool, apart from Met API calls
+_session_lock = threading.Lock()
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # the warm pool plus direct image_source() calls from page renders
+                _session = keepalive_session(MAX_WORKERS * 2)
+    return _session
+
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    folder = os.path.join(CACHE_DIR, key[:2])
+    return key, folder, os.path.join(folder, key + ".orig"), os.path.join(folder, key + ".json")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _drop_variants(folder, key):
+    for name in os.listdir(folder):
+        if name.startswith(key + "_w"):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+def _original(url):
+    """Return original bytes, downloading or revalidating as needed (None on failure)."""
+    key, folder, orig_path, meta_path = _paths(url)
+    data = _read(orig_path)
+    meta = {}
+    if data is not None:
+        try:
+            meta = json.loads(_read(meta_path) or b"{}")
+        except ValueError:
+            meta = {}
+        if time.time() - meta.get("checked_at", 0) < REVALIDATE_AFTER:
+            return data
+
+    headers = {}
+    if data is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        r = session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if r.status_code == 304 and data is not None:
+            meta["checked_at"] = time.time()
+            _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+            return data
+        r.raise_for_status()
+    except Exception:
+        return data  # serve whatever we have (possibly None)
+
+    data = r.content
+    _write_atomic(orig_path, data)
+    _drop_variants(folder, key)
+    meta = {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "checked_at": time.time(),
+    }
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+    return data
+
+
+def _resize(data, width):
+    img = Image.open(BytesIO(data))
+    img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    out = BytesIO()
+    try:
+        img.save(out, format="WEBP", quality=QUALITY, method=4)
+    except (KeyError, OSError):
+        out = BytesIO()
+        img.convert("RGB").save(out, format="JPEG", quality=QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def get_image(url, width=None):
+    """Image bytes for `url`, resized to at most `width` pixels wide. None if unavailable."""
+    if not url:
+        return None
+    key, folder, _, _ = _paths(url)
+    with _lock_for(key):
+        data = _original(url)
+        if data is None or not width:
+            return data
+        variant_path = os.path.join(folder, f"{key}_w{int(width)}")
+        variant = _read(variant_path)
+        if variant is not None:
+            return variant
+        try:
+            variant = _resize(data, int(width))
+        except Exception:
+            return data
+        _write_atomic(variant_path, variant)
+        return variant
+
+
+def image_source(url, width=None):
+    """Something `st.image` accepts: cached bytes when possible, else the URL itself."""
+    return get_image(url, width) or url
+
+
+def warm_images(urls, width=None):
+    """Start downloading/resizing `urls` concurrently; returns {url: Future of image_source(url, width)}.
+
+    Call it for a whole page before rendering so tiles do not download one after another.
+    """
+    return {u: _pool.submit(image_source, u, width) for u in dict.fromkeys(urls) if u}
@@ -0,0 +1,314 @@
+# src/llm_backends.py
+"""
+Pluggable chat-completion backends for curator notes.
+
+Every backend exposes `complete(messages, temperature, max_tokens)` -> str
+(raising on failure or timeout) and `stream(...)` -> iterator of text chunks.
+temperature=None / max_tokens=None leave the parameter to the API's default.
+`complete_with_source` / `stream_with_source` also report which backend
+produced the text, so callers can label (or refuse to keep) its output.
+
+- OpenAIBackend           : api.openai.com
+- GroqBackend             : Groq's OpenAI-compatible endpoint
+- OpenAICompatibleBackend : any OpenAI-compatible server (vLLM, Ollama, LM Studio...)
+- FakeBackend             : deterministic, offline; for tests and demos
+
+FallbackChain tries backends in order. With hedge=True it also fires the next
+backend when the current one has not answered by its observed p95 latency,
+and returns whichever succeeds first, which bounds tail latency.
+
+Every call is written to the usage ledger (src/usage_ledger.py) with its
+token counts and latency.
+"""
+import os
+import time
+import hashlib
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.openai_clients import get_client
+from src import metrics
+from src import usage_ledger
+from src.prompts import estimate_tokens
+
+DEFAULT_TIMEOUT = 30.0
+HEDGE_DEFAULT_DELAY = 8.0   # used until a backend has enough latency samples
+HEDGE_MIN_SAMPLES = 20
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+_latencies = {}  # backend name -> recent successful latencies
+_latencies_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+class LLMError(Exception):
+    """Raised when no backend produced a completion."""
+
+
+class Backend:
+    name = "backend"
+
+    def __init__(self, model, timeout=DEFAULT_TIMEOUT):
+        self.model = model
+        self.timeout = timeout
+
+    def _complete(self, messages, temperature, max_tokens):
+        raise NotImplementedError
+
+    def _complete_usage(self, messages, temperature, max_tokens):
+        """(text, usage) where usage has prompt_tokens/completion_tokens, or None if unknown."""
+        return self._complete(messages, temperature, max_tokens), None
+
+    def _stream(self, messages, temperature, max_tokens):
+        yield self._complete(messages, temperature, max_tokens)
+
+    def _record(self, messages, text, elapsed, outcome, usage=None):
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            usage_ledger.record(self.name, self.model, prompt_tokens=usage.prompt_tokens,
+                                completion_tokens=usage.completion_tokens, latency_s=elapsed, outcome=outcome)
+        else:
+            usage_ledger.record(self.name, self.model, prompt_tokens=usage_ledger.messages_tokens(messages),
+                                completion_tokens=estimate_tokens(text or ""), latency_s=elapsed,
+                                outcome=outcome, estimated=True)
+
+    def complete(self, messages, temperature=0.3, max_tokens=400):
+        start = time.perf_counter()
+        try:
+            text, usage = self._complete_usage(messages, temperature, max_tokens)
+        except Exception:
+            elapsed = time.perf_counter() - start
+            metrics.observe("llm_request_seconds", elapsed, backend=self.name, model=self.model, outcome="error")
+            self._record(messages, "", elapsed, "error")
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe("llm_request_seconds", elapsed, backend=self.name, model=self.model, outcome="ok")
+        self._record(messages, text, elapsed, "ok", usage)
+        with _latencies_lock:
+            _latencies.setdefault(self.name, deque(maxlen=200)).append(elapsed)
+        return text
+
+    def complete_with_source(self, messages, temperature=0.3, max_tokens=400):
+        """(text, backend that produced it)."""
+        return self.complete(messages, temperature, max_tokens), self
+
+    def stream(self, messages, temperature=0.3, max_tokens=400):
+        start = time.perf_counter()
+        first = True
+        parts = []
+        try:
+            for chunk in self._stream(messages, temperature, max_tokens):
+                if first:
+                    metrics.observe("llm_first_token_seconds", time.perf_counter() - start, backend=self.name, model=self.model)
+                    first = False
+                parts.append(chunk)
+                yield chunk
+        except Exception:
+            elapsed = time.perf_counter() - start
+            metrics.observe("llm_request_seconds", elapsed, backend=self.name, model=self.model, outcome="error")
+            self._record(messages, "".join(parts), elapsed, "error")
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe("llm_request_seconds", elapsed, backend=self.name, model=self.model, outcome="ok")
+        self._record(messages, "".join(parts), elapsed, "ok")
+
+    def stream_with_source(self, messages, temperature=0.3, max_tokens=400):
+        """(chunk, backend that produced it) pairs."""
+        for chunk in self.stream(messages, temperature, max_tokens):
+            yield chunk, self
+
+    def hedge_delay(self):
+        """p95 of recent latencies, or HEDGE_DEFAULT_DELAY until enough samples exist."""
+        with _latencies_lock:
+            samples = sorted(_latencies.get(self.name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return min(HEDGE_DEFAULT_DELAY, self.timeout)
+        return samples[int(0.95 * (len(samples) - 1))]
+
+
+class OpenAICompatibleBackend(Backend):
+    name = "openai_compatible"
+
+    def __init__(self, model, api_key="not-needed", base_url=None, timeout=DEFAULT_TIMEOUT, name=None):
+        super().__init__(model, timeout)
+        self.api_key = api_key
+        self.base_url = base_url
+        if name:
+            self.name = name
+
+    def _client(self):
+        # no SDK-level retries: they would stretch a call far past self.timeout;
+        # FallbackChain moves on to the next backend instead
+        if self.base_url:
+            return get_client(self.api_key, base_url=self.base_url).with_options(max_retries=0)
+        return get_client(self.api_key).with_options(max_retries=0)
+
+    def _complete(self, messages, temperature, max_tokens):
+        return self._complete_usage(messages, temperature, max_tokens)[0]
+
+    @staticmethod
+    def _sampling(temperature, max_tokens):
+        # None means "not sent": the API default (e.g. no output cap) applies
+        params = {"temperature": temperature, "max_tokens": max_tokens}
+        return {k: v for k, v in params.items() if v is not None}
+
+    def _complete_usage(self, messages, temperature, max_tokens):
+        res = self._client().chat.completions.create(
+            model=self.model, messages=messages, timeout=self.timeout,
+            **self._sampling(temperature, max_tokens),
+        )
+        return res.choices[0].message.content, getattr(res, "usage", None)
+
+    def _stream(self, messages, temperature, max_tokens):
+        stream = self._client().chat.completions.create(
+            model=self.model, messages=messages, timeout=self.timeout, stream=True,
+            **self._sampling(temperature, max_tokens),
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class OpenAIBackend(OpenAICompatibleBackend):
+    name = "openai"
+
+    def __init__(self, api_key, model="gpt-4o-mini", timeout=DEFAULT_TIMEOUT):
+        super().__init__(model, api_key=api_key, timeout=timeout)
+
+
+class GroqBackend(OpenAICompatibleBackend):
+    name = "groq"
+
+    def __init__(self, api_key, model="llama3-70b-8192", timeout=DEFAULT_TIMEOUT):
+        super().__init__(model, api_key=api_key, base_url=GROQ_BASE_URL, timeout=timeout)
+
+
+class FakeBackend(Backend):
+    """Deterministic offline backend: same messages -> same text."""
+    name = "fake"
+
+    def __init__(self, model="fake-curator", delay=0.0, fail=False, timeout=DEFAULT_TIMEOUT, name=None):
+        super().__init__(model, timeout)
+        self.delay = delay
+        self.fail = fail
+        if name:
+            self.name = name
+
+    def _complete(self, messages, temperature, max_tokens):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise LLMError(f"{self.name} configured to fail")
+        user = messages[-1]["content"] if messages else ""
+        digest = hashlib.sha256(user.encode("utf-8")).hexdigest()[:8]
+        title = next((l.split(":", 1)[1].strip() for l in user.splitlines() if l.startswith("Title:")), "this artwork")
+        return f"[{self.name}:{digest}] A curator note on {title}."
+
+    def _stream(self, messages, temperature, max_tokens):
+        for word in self._complete(messages, temperature, max_tokens).split(" "):
+            yield word + " "
+
+
+class FallbackChain:
+    def __init__(self, backends, hedge=False):
+        if not backends:
+            raise ValueError("FallbackChain needs at least one backend")
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.model = self.backends[0].model
+
+    def complete(self, messages, temperature=0.3, max_tokens=400):
+        return self.complete_with_source(messages, temperature, max_tokens)[0]
+
+    def complete_with_source(self, messages, temperature=0.3, max_tokens=400):
+        """(text, backend that answered)."""
+        if self.hedge and len(self.backends) > 1:
+            return self._complete_hedged(messages, temperature, max_tokens)
+        errors = []
+        for backend in self.backends:
+            try:
+                return backend.complete(messages, temperature, max_tokens), backend
+            except Exception as e:
+                metrics.inc("llm_fallbacks_total", backend=backend.name)
+                errors.append(f"{backend.name}: {e}")
+        raise LLMError("; ".join(errors))
+
+    def _complete_hedged(self, messages, temperature, max_tokens):
+        remaining = iter(self.backends)
+        pending = {}
+        errors = []
+
+        def launch():
+            backend = next(remaining, None)
+            if backend is not None:
+                # run in a copy of the caller's context so ledger rows keep its feature/session labels
+                pending[_hedge_pool.submit(contextvars.copy_context().run, backend.complete,
+                                           messages, temperature, max_tokens)] = backend
+            return backend
+
+        first = launch()
+        deadline = first.hedge_delay()
+        while pending:
+            done, _ = wait(list(pending), timeout=deadline, return_when=FIRST_COMPLETED)
+            if not done:
+                # primary is slower than its p95: race the next backend (slow one keeps running)
+                hedged = launch()
+                if hedged is not None:
+                    metrics.inc("llm_hedges_total", backend=hedged.name)
+                deadline = None
+                continue
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    return future.result(), backend
+                except Exception as e:
+                    metrics.inc("llm_fallbacks_total", backend=backend.name)
+                    errors.append(f"{backend.name}: {e}")
+            if not pending:
+                launch()
+        raise LLMError("; ".join(errors))
+
+    def stream(self, messages, temperature=0.3, max_tokens=400):
+        for chunk, _ in self.stream_with_source(messages, temperature, max_tokens):
+            yield chunk
+
+    def stream_with_source(self, messages, temperature=0.3, max_tokens=400):
+        """(chunk, backend) pairs; falls back only until a backend has produced its first chunk."""
+        errors = []
+        for backend in self.backends:
+            started = False
+            try:
+                for chunk in backend.stream(messages, temperature, max_tokens):
+                    started = True
+                    yield chunk, backend
+                return
+            except Exception as e:
+                if started:
+                    raise
+                metrics.inc("llm_fallbacks_total", backend=backend.name)
+                errors.append(f"{backend.name}: {e}")
+        raise LLMError("; ".join(errors))
+
+
+def default_chain(api_key=None, model="gpt-4o-mini"):
+    """OpenAI (user key) first, then any backends configured through the environment.
+
+    GROQ_API_KEY        -> GroqBackend (GROQ_MODEL)
+    LLM_LOCAL_BASE_URL  -> OpenAICompatibleBackend (LLM_LOCAL_MODEL)
+    LLM_FAKE=1          -> FakeBackend as the last resort
+    LLM_HEDGE=1         -> hedged requests across the chain
+    """
+    backends = []
+    if api_key:
+        backends.append(OpenAIBackend(api_key, model=model))
+    if os.environ.get("GROQ_API_KEY"):
+        backends.append(GroqBackend(os.environ["GROQ_API_KEY"], model=os.environ.get("GROQ_MODEL", "llama3-70b-8192")))
+    if os.environ.get("LLM_LOCAL_BASE_URL"):
+        backends.append(OpenAICompatibleBackend(
+            os.environ.get("LLM_LOCAL_MODEL", "llama3"), base_url=os.environ["LLM_LOCAL_BASE_URL"], name="local",
+        ))
+    if os.environ.get("LLM_FAKE") == "1":
+        backends.append(FakeBackend())
+    if not backends:
+        raise LLMError("no LLM backend configured")
+    return FallbackChain(backends, hedge=os.environ.get("LLM_HEDGE") == "1")
@@ -1,26 +1,339 @@
 # src/met_api.py
+import os
+import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from src.object_cache import ObjectCache, ByteLRU, FRESH, STALE
+from src.art_object import ArtObject, FAILED_TITLE
+from src.met_index import local_index
+from src.ratelimit import TokenBucket, backoff_delay
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.singleflight import SingleFlight
+from src import metrics
 
 BASE = "https://collectionapi.metmuseum.org/public/collection/v1"
+MAX_WORKERS = 8
+SEARCH_BACKEND = os.environ.get("MET_SEARCH_BACKEND", "remote")
 
-def search(q, hasImages=True, max_results=50):
-    """Search The Met collection."""
+# The Met asks clients to stay under 80 requests/second.
+RATE_LIMIT = float(os.environ.get("MET_RATE_LIMIT", 75))
+MAX_RETRIES = 4
+REQUEST_TIMEOUT = 10
+RETRY_STATUS = {403, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {403, 429}  # retried, but never counted against the circuit breaker
+NEGATIVE_TTL = 60  # seconds a failed object lookup is remembered
+# keep-alive connections kept per host: every Streamlit session can run MAX_WORKERS
+# lookups at once, and a full pool makes urllib3 open and discard extra connections
+POOL_MAXSIZE = int(os.environ.get("MET_POOL_MAXSIZE", 64))
+MEMORY_CACHE_BYTES = int(os.environ.get("MET_MEMORY_CACHE_BYTES", 64 * 1024 * 1024))
+
+_bucket = TokenBucket(RATE_LIMIT)
+_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+_stats = {"requests": 0, "throttled": 0, "throttle_wait_s": 0.0, "retried": 0, "failed": 0,
+          "short_circuited": 0, "negative_hits": 0}
+_flight = SingleFlight()
+_failed_objects = {}  # objectID -> time the failure expires
+_failed_lock = threading.Lock()
+_stats_lock = threading.Lock()
+
+_memory = ByteLRU(MEMORY_CACHE_BYTES, sizeof=ArtObject.nbytes)
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+_revalidating = set()
+_session = None
+_session_lock = threading.Lock()
+
+
+def keepalive_session(pool_maxsize):
+    """requests.Session keeping up to `pool_maxsize` connections per host alive."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def session():
+    """Shared keep-alive HTTP session for all Met API calls (images use their own, see src.image_cache)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = keepalive_session(POOL_MAXSIZE)
+    return _session
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def api_stats():
+    """Snapshot of rate-limit / retry counters for all Met API traffic."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["circuit"] = _breaker.state
+    stats["coalesced"] = _flight.shared
+    return stats
+
+
+def _retry_after(response):
     try:
-        r = requests.get(f"{BASE}/search", params={"q": q, "hasImages": hasImages})
-        r.raise_for_status()
-        data = r.json()
-        ids = data.get("objectIDs") or []
-        return ids[:max_results]
-    except Exception:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _get_json(path, params=None):
+    """GET BASE+path through the shared rate limiter, retrying throttles and transient errors.
+
+    The circuit breaker sees one outcome per call, after its retries: a single
+    stubborn request cannot open the circuit for everyone, and throttling
+    (429/403) says nothing about the API's health, so it is never a failure.
+    """
+    if not _breaker.allow():
+        _count("short_circuited")
+        raise CircuitOpenError(f"Met API circuit open, skipping {path}")
+    endpoint = path.split("/")[1]
+    for attempt in range(MAX_RETRIES + 1):
+        waited = _bucket.acquire()
+        if waited:
+            _count("throttled")
+            _count("throttle_wait_s", waited)
+        _count("requests")
+        delay = None
+        start = time.perf_counter()
+        try:
+            r = session().get(f"{BASE}{path}", params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.observe("met_api_request_seconds", time.perf_counter() - start, endpoint=endpoint, outcome="network_error")
+            error = e
+        except Exception:
+            # anything else (ChunkedEncodingError, ContentDecodingError, ...) is not retried, but it
+            # must still count as a failure or a half-open probe would never be released
+            metrics.observe("met_api_request_seconds", time.perf_counter() - start, endpoint=endpoint, outcome="error")
+            _breaker.record_failure()
+            _count("failed")
+            raise
+        else:
+            outcome = "retryable" if r.status_code in RETRY_STATUS else ("ok" if r.ok else "http_error")
+            metrics.observe("met_api_request_seconds", time.perf_counter() - start, endpoint=endpoint, outcome=outcome)
+            if r.status_code not in RETRY_STATUS:
+                # the API answered (even a 404 means it is healthy)
+                _breaker.record_success()
+                r.raise_for_status()
+                return r.json()
+            error = requests.HTTPError(f"{r.status_code} from {path}", response=r)
+            delay = _retry_after(r)
+        if attempt == MAX_RETRIES:
+            break
+        _count("retried")
+        time.sleep(delay if delay is not None else backoff_delay(attempt))
+    _count("failed")
+    if getattr(getattr(error, "response", None), "status_code", None) in THROTTLE_STATUS:
+        _breaker.release()
+    else:
+        _breaker.record_failure()
+    raise error
+
+
+def disk_cache():
+    """Process-wide persistent object cache (created lazily)."""
+    global _disk_cache
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                _disk_cache = ObjectCache()
+    return _disk_cache
+
+
+def _search_local(q, max_results):
+    index = local_index()
+    if index is None:
         return []
+    return index.search(q, max_results)
+
+
+def search(q, hasImages=True, max_results=50, backend=None):
+    """Search The Met collection.
+
+    backend: "remote" (Met /search API) or "local" (offline index, see src/met_index.py).
+    Remote failures fall back to the local index when one has been built.
+    """
+    backend = backend or SEARCH_BACKEND
+    if backend == "local":
+        return _search_local(q, max_results)
+    try:
+        return list(_remote_search_ids(q, bool(hasImages))[:max_results])
+    except Exception:
+        return _search_local(q, max_results)
+
+
+@lru_cache(maxsize=256)
+def _remote_search_ids(q, hasImages):
+    # failures raise and are therefore never cached
+    data = _flight.do(("search", q, hasImages), _get_json, "/search", params={"q": q, "hasImages": hasImages})
+    return tuple(data.get("objectIDs") or [])
+
+
+def iter_search(q, page_size=12, start=0, max_results=None, hasImages=True, backend=None,
+                max_workers=MAX_WORKERS):
+    """Yield hydrated objects for a search, one page of metadata at a time.
+
+    The next page is fetched while the current one is being consumed, and the
+    ID list is cached, so asking again with a larger `max_results` ("load more")
+    only hits the network for the new objects.
+    """
+    limit = None if max_results is None else start + max_results
+    ids = search(q, hasImages=hasImages, max_results=limit, backend=backend)[start:]
+    pages = [ids[i:i + page_size] for i in range(0, len(ids), max(1, page_size))]
+    if not pages:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, page_size))) as pool:
+        pending = [pool.submit(get_object, i) for i in pages[0]]
+        for n in range(len(pages)):
+            upcoming = [pool.submit(get_object, i) for i in pages[n + 1]] if n + 1 < len(pages) else []
+            for f in pending:
+                yield f.result()
+            pending = upcoming
 
-@lru_cache(maxsize=1024)
-def get_object(object_id):
-    """Get full object metadata by id."""
+
+def _fetch_object(object_id):
+    return _get_json(f"/objects/{object_id}")
+
+
+def _revalidate(object_id):
+    try:
+        disk_cache().put(object_id, _fetch_object(object_id))
+    except Exception:
+        pass  # keep serving the stale copy
+    finally:
+        with _disk_cache_lock:
+            _revalidating.discard(object_id)
+
+
+def _schedule_revalidate(object_id):
+    with _disk_cache_lock:
+        if object_id in _revalidating:
+            return
+        _revalidating.add(object_id)
+    threading.Thread(target=_revalidate, args=(object_id,), daemon=True).start()
+
+
+def _recently_failed(object_id):
+    with _failed_lock:
+        expires = _failed_objects.get(object_id)
+        if expires is None:
+            return False
+        if expires > time.time():
+            return True
+        del _failed_objects[object_id]
+        return False
+
+
+def _remember_failure(object_id):
+    now = time.time()
+    with _failed_lock:
+        if len(_failed_objects) > 10000:
+            for k in [k for k, v in _failed_objects.items() if v <= now]:
+                del _failed_objects[k]
+        _failed_objects[object_id] = now + NEGATIVE_TTL
+
+
+def _load_object(object_id):
+    """Full Met payload from the disk cache or the API. Raises on failure."""
+    cache = disk_cache()
+    cached, state = cache.get(object_id)
+    metrics.inc("cache_requests_total", cache="met_disk", result=state)
+    if state == FRESH:
+        return cached
+    if state == STALE:
+        _schedule_revalidate(object_id)
+        return cached
+    if _recently_failed(object_id):
+        _count("negative_hits")
+        metrics.inc("cache_requests_total", cache="met_negative", result="hit")
+        raise LookupError(f"object {object_id} failed recently")
+    try:
+        meta = _fetch_object(object_id)
+    except Exception:
+        _remember_failure(object_id)
+        raise
+    cache.put(object_id, meta)
+    return meta
+
+
+def get_object(object_id, full=False):
+    """Get object metadata by id (memory -> disk cache -> Met API).
+
+    Returns a compact ArtObject (see src/art_object.py) held in a byte-bounded
+    memory cache; pass full=True for the complete Met JSON dict instead.
+    Failures are remembered for NEGATIVE_TTL seconds; while the API is down an
+    expired disk copy is served when one exists.
+    """
+    if not full:
+        record = _memory.get(object_id)
+        metrics.inc("cache_requests_total", cache="met_memory", result="miss" if record is None else "hit")
+        if record is not None:
+            return record
     try:
-        r = requests.get(f"{BASE}/objects/{object_id}")
-        r.raise_for_status()
-        return r.json()
+        # concurrent sessions asking for the same object share one fetch
+        meta = _flight.do(("object", object_id), _load_object, object_id)
     except Exception:
-        return {"objectID": object_id, "title": "(failed to fetch)", "primaryImageSmall": None}
+        meta, _ = disk_cache().get(object_id, allow_expired=True)
+        if meta is None:
+            meta = {"objectID": object_id, "title": FAILED_TITLE, "primaryImageSmall": None}
+        return meta if full else ArtObject.from_meta(meta)
+    if full:
+        return meta
+    record = ArtObject.from_meta(meta)
+    _memory.put(object_id, record)
+    return record
+
+
+def changed_since(date):
+    """objectIDs whose metadata changed on or after `date` (YYYY-MM-DD): one bulk call."""
+    data = _get_json("/objects", params={"metadataDate": date})
+    return set(data.get("objectIDs") or [])
+
+
+def all_object_ids():
+    """Every objectID the Met currently lists: one bulk call."""
+    data = _get_json("/objects")
+    return set(data.get("objectIDs") or [])
+
+
+def refresh_object(object_id):
+    """Fetch an object from the API bypassing every cache, and update the caches.
+
+    Returns None when the Met no longer has the object (404); its cached
+    copies are dropped. Other failures raise.
+    """
+    try:
+        meta = _fetch_object(object_id)
+    except requests.HTTPError as e:
+        if getattr(e.response, "status_code", None) != 404:
+            raise
+        disk_cache().delete(object_id)
+        _memory.pop(object_id)
+        return None
+    disk_cache().put(object_id, meta)
+    _memory.put(object_id, ArtObject.from_meta(meta))
+    return meta
+
+
+def memory_cache_info():
+    """Entry count and estimated size of the in-memory object cache."""
+    return {"entries": len(_memory), "bytes": _memory.nbytes, "max_bytes": _memory.max_bytes}
+
+
+def get_objects(ids, max_workers=MAX_WORKERS, full=False):
+    """Fetch many objects concurrently; results keep the order of `ids`."""
+    ids = list(ids)
+    if len(ids) <= 1 or max_workers <= 1:
+        return [get_object(i, full=full) for i in ids]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as pool:
+        return list(pool.map(lambda i: get_object(i, full=full), ids))
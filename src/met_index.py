@@ -0,0 +1,165 @@
+# src/met_index.py
+"""
+Offline index of The Met collection built from the Open Access CSV dump
+(https://github.com/metmuseum/openaccess, MetObjects.csv).
+
+Build once:
+    python -m src.met_index path/to/MetObjects.csv
+
+Then `src.met_api.search(q, backend="local")` answers from the SQLite FTS5
+inverted index (title / artist / culture / medium / tags) without touching
+the network. The CSV has no image URLs, so `hasImages` cannot be honoured
+locally; images still come from `get_object`.
+"""
+import os
+import re
+import csv
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+
+DEFAULT_PATH = os.environ.get("MET_INDEX_PATH", os.path.join("data", "met_index.sqlite"))
+
+# CSV column -> index column
+CSV_FIELDS = {
+    "Object ID": "object_id",
+    "Title": "title",
+    "Artist Display Name": "artist",
+    "Culture": "culture",
+    "Medium": "medium",
+    "Tags": "tags",
+    "Department": "department",
+    "Object Date": "object_date",
+    "Object Begin Date": "begin_year",
+    "Object End Date": "end_year",
+    "Country": "country",
+}
+TEXT_COLUMNS = ["title", "artist", "culture", "medium", "tags"]
+# bm25 weights, same order as TEXT_COLUMNS
+COLUMN_WEIGHTS = (10.0, 8.0, 3.0, 2.0, 4.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fts_query(q):
+    # quote every token so user input can never be parsed as FTS syntax
+    tokens = _TOKEN_RE.findall(q or "")
+    return " ".join(f'"{t}"' for t in tokens)
+
+
+class MetIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            " object_id INTEGER PRIMARY KEY,"
+            " title TEXT, artist TEXT, culture TEXT, medium TEXT, tags TEXT,"
+            " department TEXT, object_date TEXT, begin_year INTEGER, end_year INTEGER, country TEXT)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5("
+            + ", ".join(TEXT_COLUMNS)
+            + ", content='objects', content_rowid='object_id')"
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def ingest_csv(self, csv_path, batch_size=5000, progress=None):
+        """Load MetObjects.csv into the index (replacing previous contents). Returns row count."""
+        columns = list(CSV_FIELDS.values())
+        insert = f"INSERT OR REPLACE INTO objects ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        count = 0
+        with self._lock, open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            self._conn.execute("DELETE FROM objects")
+            batch = []
+            for row in csv.DictReader(f):
+                oid = _to_int(row.get("Object ID"))
+                if oid is None:
+                    continue
+                values = []
+                for src, col in CSV_FIELDS.items():
+                    v = (row.get(src) or "").strip()
+                    if col == "object_id":
+                        v = oid
+                    elif col in ("begin_year", "end_year"):
+                        v = _to_int(v)
+                    elif col == "tags":
+                        v = v.replace("|", " ")
+                    values.append(v or None)
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    self._conn.executemany(insert, batch)
+                    count += len(batch)
+                    batch = []
+                    if progress:
+                        progress(count)
+            if batch:
+                self._conn.executemany(insert, batch)
+                count += len(batch)
+            self._conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('rebuild')")
+            self._conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('optimize')")
+            self._conn.commit()
+        return count
+
+    def search(self, q, max_results=50):
+        """Return objectIDs ranked by bm25 relevance."""
+        match = _fts_query(q)
+        if not match:
+            return []
+        weights = ", ".join(str(w) for w in COLUMN_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid FROM objects_fts WHERE objects_fts MATCH ? "
+                f"ORDER BY bm25(objects_fts, {weights}) LIMIT ?",
+                (match, -1 if max_results is None else int(max_results)),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def local_index():
+    """Process-wide index, or None when it has not been built yet."""
+    global _index
+    if _index is None:
+        if not os.path.exists(DEFAULT_PATH):
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = MetIndex(DEFAULT_PATH)
+    return _index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline Met collection index from MetObjects.csv")
+    parser.add_argument("csv_path", help="path to MetObjects.csv")
+    parser.add_argument("--index", default=DEFAULT_PATH, help=f"output SQLite file (default: {DEFAULT_PATH})")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    index = MetIndex(args.index)
+    n = index.ingest_csv(args.csv_path, progress=lambda c: print(f"  {c} rows...", file=sys.stderr))
+    print(f"Indexed {n} objects into {args.index} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
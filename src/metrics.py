@@ -0,0 +1,145 @@
+# src/metrics.py
+"""
+Process-wide counters and latency histograms with a Prometheus text export.
+
+    from src import metrics
+    metrics.inc("cache_requests_total", cache="met_memory", result="hit")
+    with metrics.timer("render_seconds", section="gallery"):
+        ...
+    print(metrics.export_prometheus())
+"""
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "met_api_request_seconds": "Latency of Met API HTTP requests by endpoint and outcome.",
+    "cache_requests_total": "Cache lookups by cache layer and result.",
+    "llm_request_seconds": "Latency of uncached LLM completion calls.",
+    "llm_first_token_seconds": "Time to first streamed token of an LLM completion.",
+    "llm_fallbacks_total": "LLM backend failures that moved on to the next backend.",
+    "llm_hedges_total": "Hedged LLM requests fired because the previous backend exceeded its p95.",
+    "curator_note_seconds": "End-to-end latency of explain_object.",
+    "render_seconds": "Streamlit render time per app section.",
+    "note_prefetch_total": "Background curator-note pre-warming by outcome.",
+}
+
+_counters = {}    # name -> {labels: value}
+_histograms = {}  # name -> {labels: [bucket_counts..., sum, count]}
+_lock = threading.Lock()
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        k = _key(labels)
+        series[k] = series.get(k, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        k = _key(labels)
+        row = series.get(k)
+        if row is None:
+            row = series[k] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                row[i] += 1
+        row[-2] += seconds
+        row[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of `timer`."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _quantile(row, q):
+    count = row[-1]
+    if not count:
+        return None
+    target = q * count
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if row[i] >= target:
+            return bound
+    return float("inf")
+
+
+def snapshot():
+    """Plain rows for display: one per (metric, labels)."""
+    rows = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            for k, value in sorted(series.items()):
+                rows.append({"metric": name, "labels": dict(k), "count": value})
+        for name, series in sorted(_histograms.items()):
+            for k, row in sorted(series.items()):
+                rows.append({
+                    "metric": name,
+                    "labels": dict(k),
+                    "count": row[-1],
+                    "avg_s": row[-2] / row[-1] if row[-1] else None,
+                    "p50_s": _quantile(row, 0.5),
+                    "p95_s": _quantile(row, 0.95),
+                })
+    return rows
+
+
+def _fmt_labels(k, extra=()):
+    pairs = list(k) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(a, str(b).replace("\\", "\\\\").replace('"', '\\"')) for a, b in pairs)
+    return "{" + body + "}"
+
+
+def export_prometheus():
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for k, value in sorted(series.items()):
+                lines.append(f"{name}{_fmt_labels(k)} {value}")
+        for name, series in sorted(_histograms.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for k, row in sorted(series.items()):
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    lines.append(f"{name}_bucket{_fmt_labels(k, [('le', bound)])} {row[i]}")
+                lines.append(f"{name}_bucket{_fmt_labels(k, [('le', '+Inf')])} {row[-1]}")
+                lines.append(f"{name}_sum{_fmt_labels(k)} {row[-2]}")
+                lines.append(f"{name}_count{_fmt_labels(k)} {row[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -0,0 +1,113 @@
+# src/note_prefetch.py
+"""
+Background pre-warming of curator notes.
+
+After the gallery renders, `prefetch_notes(metas, api_key)` queues note
+generation for the first TOP_N objects that have no stored note yet. Work runs
+on a small process-wide thread pool, so the page never waits for it; notes land
+in the curator note store and a later "Curator Note" click is a cache hit (or,
+streamed or not, waits for the in-flight call through the curator's
+single-flight instead of paying for a second one).
+
+Each API key gets its own token bucket (RATE notes/second) and an hourly
+BUDGET, so pre-warming cannot run up a user's bill on its own; a failed note
+gives its budget unit back.
+"""
+import os
+import time
+import hashlib
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src import curator
+from src import metrics
+from src import usage_ledger
+from src.ratelimit import TokenBucket
+
+ENABLED = os.environ.get("NOTE_PREFETCH", "0") == "1"
+TOP_N = int(os.environ.get("NOTE_PREFETCH_TOP_N", "6"))
+BUDGET = int(os.environ.get("NOTE_PREFETCH_BUDGET", "30"))  # notes per key per hour
+RATE = float(os.environ.get("NOTE_PREFETCH_RATE", "0.5"))   # notes per second per key
+BUDGET_WINDOW = 3600
+MAX_WORKERS = 2
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="note-prefetch")
+_lock = threading.Lock()
+_buckets = {}   # key id -> TokenBucket
+_spent = {}     # key id -> deque of submit timestamps within BUDGET_WINDOW
+_queued = set()  # objectIDs queued or running
+
+
+def _key_id(api_key):
+    # never keep raw keys around longer than needed
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+
+def _reserve(key_id):
+    """Take one unit of the hourly budget for `key_id`; False when exhausted."""
+    now = time.time()
+    spent = _spent.setdefault(key_id, deque())
+    while spent and spent[0] < now - BUDGET_WINDOW:
+        spent.popleft()
+    if len(spent) >= BUDGET:
+        return False
+    spent.append(now)
+    return True
+
+
+def _refund(key_id):
+    """Give back the most recent budget unit of `key_id` (its note was never produced)."""
+    with _lock:
+        spent = _spent.get(key_id)
+        if spent:
+            spent.pop()
+
+
+def remaining_budget(api_key):
+    with _lock:
+        spent = _spent.get(_key_id(api_key), ())
+        return max(0, BUDGET - sum(1 for t in spent if t >= time.time() - BUDGET_WINDOW))
+
+
+def _warm(meta, api_key, key_id, bucket):
+    try:
+        bucket.acquire()
+        with usage_ledger.usage_context(feature="note_prefetch"):
+            curator.explain_object(meta, api_key=api_key, raise_errors=True)
+        metrics.inc("note_prefetch_total", result="generated")
+    except Exception:
+        metrics.inc("note_prefetch_total", result="error")
+        _refund(key_id)
+    finally:
+        with _lock:
+            _queued.discard(meta.get("objectID"))
+
+
+def prefetch_notes(metas, api_key, top_n=TOP_N):
+    """Queue background note generation for the first `top_n` metas. Returns how many were queued."""
+    if not api_key:
+        return 0
+    key_id = _key_id(api_key)
+    queued = 0
+    for meta in list(metas)[:top_n]:
+        object_id = meta.get("objectID") if meta else None
+        if object_id is None:
+            continue
+        with _lock:
+            if object_id in _queued:
+                continue
+        if curator.stored_note(meta) is not None:
+            metrics.inc("note_prefetch_total", result="cached")
+            continue
+        with _lock:
+            if object_id in _queued:
+                continue
+            if not _reserve(key_id):
+                metrics.inc("note_prefetch_total", result="over_budget")
+                break
+            bucket = _buckets.setdefault(key_id, TokenBucket(RATE, capacity=1))
+            _queued.add(object_id)
+        _pool.submit(contextvars.copy_context().run, _warm, meta, api_key, key_id, bucket)
+        queued += 1
+    return queued
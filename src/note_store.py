@@ -0,0 +1,115 @@
+# src/note_store.py
+"""
+Durable store for generated curator notes (SQLite).
+
+Notes are keyed by a content hash of everything that determines the output:
+the metadata string, model, temperature and prompt version. The API key is
+never part of the key, so a note paid for once is served to every user and
+survives restarts. Bumping the prompt version in src/curator.py makes old
+notes unreachable; `purge(keep_version=...)` then deletes them.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from src.similarity import minhash, pack_signature, unpack_signature
+
+DEFAULT_PATH = os.environ.get("CURATOR_NOTES_PATH", os.path.join("data", "curator_notes.sqlite"))
+
+
+def note_key(meta_str, model, temperature, prompt_version):
+    raw = json.dumps([meta_str, model, float(temperature), prompt_version], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class NoteStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            " key TEXT PRIMARY KEY,"
+            " object_id INTEGER,"
+            " model TEXT NOT NULL,"
+            " prompt_version TEXT NOT NULL,"
+            " note TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " meta_str TEXT,"
+            " signature BLOB)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(notes)")]
+        if "meta_str" not in columns:  # stores created before similarity lookup existed
+            self._conn.execute("ALTER TABLE notes ADD COLUMN meta_str TEXT")
+        if "signature" not in columns:  # MinHash of meta_str, filled in by similarity_rows()
+            self._conn.execute("ALTER TABLE notes ADD COLUMN signature BLOB")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_object ON notes(object_id)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT note FROM notes WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, note, object_id=None, model="", prompt_version="", meta_str=None):
+        """meta_str (optional) is the metadata text the note describes, used for similarity lookups.
+
+        Its MinHash signature is stored alongside, so the similarity index loads without rehashing.
+        """
+        signature = pack_signature(minhash(meta_str)) if meta_str else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO notes (key, object_id, model, prompt_version, note, created_at, meta_str, signature)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, object_id, model, prompt_version, note, time.time(), meta_str, signature),
+            )
+            self._conn.commit()
+
+    def similarity_rows(self):
+        """(key, meta_str, prompt_version, model, signature) for every note stored with its metadata text.
+
+        Rows written before signatures were stored are hashed once here and backfilled.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, meta_str, prompt_version, model, signature FROM notes WHERE meta_str IS NOT NULL"
+            ).fetchall()
+        result, backfill = [], []
+        for key, meta_str, version, model, blob in rows:
+            sig = unpack_signature(blob)
+            if sig is None:
+                sig = minhash(meta_str)
+                if sig is not None:
+                    backfill.append((pack_signature(sig), key))
+            result.append((key, meta_str, version, model, sig))
+        if backfill:
+            with self._lock:
+                self._conn.executemany("UPDATE notes SET signature = ? WHERE key = ?", backfill)
+                self._conn.commit()
+        return result
+
+    def invalidate(self, object_id=None):
+        """Drop notes for one object (or every note when object_id is None). Returns rows removed."""
+        with self._lock:
+            if object_id is None:
+                cur = self._conn.execute("DELETE FROM notes")
+            else:
+                cur = self._conn.execute("DELETE FROM notes WHERE object_id = ?", (object_id,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def purge(self, keep_version):
+        """Delete notes written with any prompt version other than `keep_version`."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM notes WHERE prompt_version != ?", (keep_version,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
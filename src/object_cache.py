@@ -0,0 +1,158 @@
+# src/object_cache.py
+"""
+Persistent on-disk cache for Met object metadata (SQLite, keyed by objectID).
+
+- fresh  : age < ttl            -> served as-is
+- stale  : ttl <= age < ttl+swr -> served as-is, caller should revalidate in background
+- expired: older than that      -> treated as a miss
+Entries are evicted least-recently-used once the table grows past max_entries.
+Access times are only rewritten once they are ACCESS_RESOLUTION seconds old,
+so warm reads normally stay read-only.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_PATH = os.environ.get("MET_CACHE_PATH", os.path.join("data", "cache", "met_objects.sqlite"))
+DEFAULT_TTL = float(os.environ.get("MET_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_STALE_TTL = float(os.environ.get("MET_CACHE_STALE_TTL", 30 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("MET_CACHE_MAX_ENTRIES", 50000))
+ACCESS_RESOLUTION = 300.0  # seconds; LRU order only needs to be this precise
+
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+
+class ObjectCache:
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # a cache can lose its last few writes on power loss; skip the fsync per commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            " object_id INTEGER PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_objects_accessed ON objects(accessed_at)")
+        self._conn.commit()
+
+    def get(self, object_id, allow_expired=False):
+        """Return (payload, state) where state is FRESH, STALE or MISS.
+
+        allow_expired=True returns entries past the stale window as STALE
+        (useful as a last resort while upstream is unavailable).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at, accessed_at FROM objects WHERE object_id = ?", (int(object_id),)
+            ).fetchone()
+            if row is None:
+                return None, MISS
+            payload, fetched_at, accessed_at = row
+            age = now - fetched_at
+            if age >= self.ttl + self.stale_ttl and not allow_expired:
+                return None, MISS
+            if now - accessed_at >= ACCESS_RESOLUTION:
+                self._conn.execute("UPDATE objects SET accessed_at = ? WHERE object_id = ?", (now, int(object_id)))
+                self._conn.commit()
+        return json.loads(payload), (FRESH if age < self.ttl else STALE)
+
+    def put(self, object_id, payload):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (object_id, payload, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (int(object_id), json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, object_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM objects WHERE object_id = ?", (int(object_id),))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM objects")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def _evict(self):
+        # caller holds the lock
+        count = self._conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM objects WHERE object_id IN ("
+                " SELECT object_id FROM objects ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+
+class ByteLRU:
+    """In-memory LRU bounded by an estimated byte budget rather than an entry count."""
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._items = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def pop(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return None
+            self._bytes -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._items)
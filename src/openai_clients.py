@@ -0,0 +1,60 @@
+# src/openai_clients.py
+"""
+Thread-safe pool of OpenAI clients, one per API key (and base_url).
+
+Reusing a client keeps its HTTP connection pool (and TLS sessions) warm, and
+passing clients around explicitly avoids the legacy module-level
+`openai.api_key` global, which concurrent Streamlit sessions overwrite for
+each other. Clients idle for longer than IDLE_TIMEOUT are closed.
+"""
+import time
+import hashlib
+import threading
+from openai import OpenAI
+
+IDLE_TIMEOUT = 10 * 60
+MAX_CLIENTS = 64
+
+_clients = {}  # sha256(api_key|base_url) -> [client, last_used]
+_lock = threading.Lock()
+
+
+def _close(client):
+    try:
+        client.close()
+    except Exception:
+        pass
+
+
+def _evict_idle(now):
+    # caller holds the lock
+    expired = [k for k, (_, used) in _clients.items() if now - used > IDLE_TIMEOUT]
+    if len(_clients) - len(expired) >= MAX_CLIENTS:
+        by_age = sorted((used, k) for k, (_, used) in _clients.items() if k not in expired)
+        expired += [k for _, k in by_age[:len(_clients) - len(expired) - MAX_CLIENTS + 1]]
+    for k in expired:
+        _close(_clients.pop(k)[0])
+
+
+def get_client(api_key, **kwargs):
+    """Shared OpenAI client for `api_key` (extra kwargs only apply when it is first created)."""
+    if not api_key:
+        raise ValueError("api_key is required")
+    # different endpoints (OpenAI, Groq, local servers) get separate clients
+    key = hashlib.sha256(f"{api_key}|{kwargs.get('base_url') or ''}".encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    with _lock:
+        entry = _clients.get(key)
+        if entry is None:
+            _evict_idle(now)
+            entry = _clients[key] = [OpenAI(api_key=api_key, **kwargs), now]
+        else:
+            entry[1] = now
+        return entry[0]
+
+
+def close_all():
+    with _lock:
+        for client, _ in _clients.values():
+            _close(client)
+        _clients.clear()
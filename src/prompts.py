@@ -0,0 +1,126 @@
+# src/prompts.py
+"""
+Versioned prompt templates loaded from prompts/curator_prompts.md.
+
+The file is parsed once per modification time. Placeholders ({title},
+{artist}, ...) are filled from Met metadata; each value is capped at
+FIELD_TOKEN_LIMITS and, if the whole user prompt is still over
+`budget_tokens`, the longest fields are trimmed further, so prompt size
+(and therefore latency and cost) stays predictable.
+"""
+import os
+import re
+from functools import lru_cache
+
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts", "curator_prompts.md")
+DEFAULT_BUDGET_TOKENS = 350
+
+# placeholder -> Met metadata keys, first non-empty wins
+PLACEHOLDER_FIELDS = {
+    "title": ("title",),
+    "artist": ("artistDisplayName",),
+    "date": ("objectDate",),
+    "medium": ("medium",),
+    "dimensions": ("dimensions",),
+    "provenance": ("creditLine",),
+    "image_url": ("primaryImageSmall", "primaryImage"),
+    "culture": ("culture",),
+    "department": ("department",),
+}
+FIELD_TOKEN_LIMITS = {
+    "title": 40, "artist": 30, "date": 15, "medium": 40,
+    "dimensions": 30, "provenance": 50, "image_url": 40,
+}
+DEFAULT_FIELD_LIMIT = 40
+
+_VERSION_RE = re.compile(r"^##\s+(\S+)\s*$")
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English BPE vocabularies)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def truncate_tokens(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, max_tokens * 4 - 1)].rstrip()
+    return cut + "…"
+
+
+class PromptTemplate:
+    def __init__(self, version, system, user):
+        self.version = version
+        self.system = system
+        self.user = user
+        self.placeholders = tuple(dict.fromkeys(_PLACEHOLDER_RE.findall(user)))
+
+    def values(self, meta):
+        out = {}
+        for name in self.placeholders:
+            value = next((meta.get(k) for k in PLACEHOLDER_FIELDS.get(name, (name,)) if meta.get(k)), None)
+            value = " ".join(str(value).split()) if value else "Unknown"
+            out[name] = truncate_tokens(value, FIELD_TOKEN_LIMITS.get(name, DEFAULT_FIELD_LIMIT))
+        return out
+
+    def fill(self, values):
+        return _PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1), m.group(0)), self.user)
+
+    def render(self, meta, budget_tokens=DEFAULT_BUDGET_TOKENS, extra=""):
+        """(system, user) prompts for `meta`; `extra` is appended to the user prompt and never trimmed."""
+        values = self.values(meta)
+        user = self.fill(values) + extra
+        while estimate_tokens(user) > budget_tokens:
+            # trim the longest remaining field by half until within budget
+            name = max(values, key=lambda k: len(values[k]), default=None)
+            if name is None or estimate_tokens(values[name]) <= 2:
+                break
+            values[name] = truncate_tokens(values[name], estimate_tokens(values[name]) // 2)
+            user = self.fill(values) + extra
+        return self.system, user
+
+
+def _parse(text):
+    sections = {}
+    current, lines = None, []
+    for line in text.splitlines() + ["## __end__"]:
+        m = _VERSION_RE.match(line)
+        if m:
+            if current is not None:
+                sections[current] = lines
+            current, lines = m.group(1), []
+        elif current is not None:
+            lines.append(line)
+    sections.pop("__end__", None)
+
+    templates = {}
+    for version, body in sections.items():
+        block = "\n".join(body)
+        if "SYSTEM:" not in block or "USER TEMPLATE:" not in block:
+            raise ValueError(f"prompt version {version} needs SYSTEM: and USER TEMPLATE: sections")
+        system = block.split("SYSTEM:", 1)[1].split("USER TEMPLATE:", 1)[0].strip()
+        user = block.split("USER TEMPLATE:", 1)[1].strip() + "\n"
+        templates[version] = PromptTemplate(version, system, user)
+    return templates
+
+
+@lru_cache(maxsize=8)
+def _load(path, mtime):
+    with open(path, "r", encoding="utf-8") as f:
+        return _parse(f.read())
+
+
+def load_prompts(path=PROMPTS_PATH):
+    """{version: PromptTemplate}, in file order; re-read only when the file changes."""
+    return _load(path, os.path.getmtime(path))
+
+
+def get_prompt(version=None, path=PROMPTS_PATH):
+    """The requested version, or the last one in the file."""
+    templates = load_prompts(path)
+    if not templates:
+        raise ValueError(f"no prompt versions found in {path}")
+    if version is None:
+        return list(templates.values())[-1]
+    return templates[version]
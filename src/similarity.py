@@ -0,0 +1,97 @@
+# src/similarity.py
+"""
+Local near-duplicate detection for short metadata strings.
+
+Texts are split into character 5-gram shingles and summarised by a 64-value
+MinHash signature; an LSH index (16 bands x 4 rows) finds candidates in
+roughly constant time and the signature agreement estimates their Jaccard
+similarity. Everything is deterministic and offline, so signatures can be
+stored (`pack_signature`) and an index rebuilt from them without rehashing.
+"""
+import re
+import zlib
+import struct
+import random
+import threading
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+_PRIME = (1 << 61) - 1
+
+_rng = random.Random(1337)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text, k=SHINGLE):
+    text = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(text):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def pack_signature(sig):
+    return struct.pack(f"<{NUM_PERM}Q", *sig) if sig is not None else None
+
+
+def unpack_signature(blob):
+    if not blob or len(blob) != 8 * NUM_PERM:
+        return None
+    return struct.unpack(f"<{NUM_PERM}Q", blob)
+
+
+def estimate_jaccard(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+class SimilarityIndex:
+    def __init__(self, threshold=0.9):
+        self.threshold = threshold
+        self._signatures = {}  # key -> (signature, payload)
+        self._buckets = {}     # (band, band_hash) -> set(keys)
+        self._lock = threading.Lock()
+
+    def add(self, key, text, payload=None, signature=None):
+        """Index `text` under `key`; pass a precomputed `signature` to skip hashing it."""
+        sig = signature if signature is not None else minhash(text)
+        if sig is None:
+            return
+        with self._lock:
+            self._signatures[key] = (sig, payload)
+            for band in range(BANDS):
+                chunk = sig[band * ROWS:(band + 1) * ROWS]
+                self._buckets.setdefault((band, hash(chunk)), set()).add(key)
+
+    def query(self, text, accept=None):
+        """Best (key, similarity, payload) at or above the threshold, or None.
+
+        `accept(payload)` can reject candidates (e.g. from another prompt version).
+        """
+        sig = minhash(text)
+        if sig is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for band in range(BANDS):
+                chunk = sig[band * ROWS:(band + 1) * ROWS]
+                candidates |= self._buckets.get((band, hash(chunk)), set())
+            best = None
+            for key in candidates:
+                other, payload = self._signatures[key]
+                if accept is not None and not accept(payload):
+                    continue
+                score = estimate_jaccard(sig, other)
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (key, score, payload)
+        return best
+
+    def __len__(self):
+        return len(self._signatures)
@@ -0,0 +1,64 @@
+# src/singleflight.py
+"""
+Request coalescing: while a call for `key` is in flight, other threads asking
+for the same key wait for that call and share its result (or exception)
+instead of issuing their own.
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # calls answered by someone else's in-flight request
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def join(self, key, timeout=None):
+        """Wait for an in-flight call for `key`: (True, result) once it finishes (its error is
+        raised), or (False, None) right away when nothing is in flight or it outlasts `timeout`."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+        if call is None or not call.event.wait(timeout):
+            return False, None
+        if call.error is not None:
+            raise call.error
+        return True, call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
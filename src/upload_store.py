@@ -0,0 +1,134 @@
+# src/upload_store.py
+"""
+Content-addressed storage for uploaded / generated images.
+
+Image bytes live in data/uploads/blobs/<aa>/<sha256>.<ext>, named by the
+SHA-256 of their content, so saving the same image twice stores it once.
+Metadata (title, description, time, size) is appended as one JSON line to
+data/uploads/index.ndjson. A save is therefore one blob write plus one short
+append, independent of how many uploads exist; re-saving an image under the
+same title writes nothing (the indexed (sha256, title) pairs are read once per
+process and kept in memory).
+
+`import_legacy_json()` moves entries from the old data/generated_catalog.json
+format (PNG bytes decoded as latin1 inside JSON) into the store.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+ROOT = os.environ.get("UPLOAD_STORE_PATH", os.path.join("data", "uploads"))
+LEGACY_JSON = os.path.join("data", "generated_catalog.json")
+
+_lock = threading.Lock()
+_indexed = {}  # root -> {(sha256, title): record}, loaded from the index once
+
+
+def _blob_dir(root=ROOT):
+    return os.path.join(root, "blobs")
+
+
+def _index_path(root=ROOT):
+    return os.path.join(root, "index.ndjson")
+
+
+def blob_path(sha256, ext="png", root=ROOT):
+    return os.path.join(_blob_dir(root), sha256[:2], f"{sha256}.{ext}")
+
+
+def put_blob(data, ext="png", root=ROOT):
+    """Store `data` under its SHA-256 (once). Returns (sha256, newly_written)."""
+    sha = hashlib.sha256(data).hexdigest()
+    path = blob_path(sha, ext, root)
+    if os.path.exists(path):
+        return sha, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)  # atomic: readers never see a partial blob
+    return sha, True
+
+
+def read_blob(sha256, ext="png", root=ROOT):
+    with open(blob_path(sha256, ext, root), "rb") as f:
+        return f.read()
+
+
+def _indexed_records(root):
+    # caller holds _lock
+    records = _indexed.get(root)
+    if records is None:
+        records = _indexed[root] = {(r.get("sha256"), r.get("title")): r for r in iter_uploads(root)}
+    return records
+
+
+def save_upload(data, title, description="", ext="png", source="upload", root=ROOT):
+    """Store image bytes plus a metadata record; returns the record.
+
+    Saving an image that is already indexed under the same title returns the
+    existing record instead of appending another index line.
+    """
+    sha, _ = put_blob(data, ext, root)
+    record = {
+        "sha256": sha, "ext": ext, "title": title, "description": description,
+        "size": len(data), "source": source, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _lock:
+        indexed = _indexed_records(root)
+        existing = indexed.get((sha, title))
+        if existing is not None:
+            return existing
+        os.makedirs(root, exist_ok=True)
+        with open(_index_path(root), "a", encoding="utf-8") as f:
+            f.write(line)
+        indexed[(sha, title)] = record
+    return record
+
+
+def iter_uploads(root=ROOT):
+    """Metadata records in save order (torn or blank lines skipped)."""
+    path = _index_path(root)
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def import_legacy_json(path=LEGACY_JSON, root=ROOT):
+    """Move latin1 image entries from the old JSON catalog into the store.
+
+    Entries without image bytes stay in the JSON file; the migrated ones are
+    removed from it. Returns the number of entries imported.
+    """
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    legacy = [e for e in entries if isinstance(e, dict) and e.get("image_bytes")]
+    if not legacy:
+        return 0
+    known = {(r.get("sha256"), r.get("title")) for r in iter_uploads(root)}
+    for e in legacy:
+        data = e["image_bytes"].encode("latin1")
+        sha = hashlib.sha256(data).hexdigest()
+        if (sha, e.get("title")) not in known:
+            save_upload(data, e.get("title", "Generated"), e.get("description", ""), root=root)
+    rest = [e for e in entries if not (isinstance(e, dict) and e.get("image_bytes"))]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(rest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return len(legacy)
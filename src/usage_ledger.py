@@ -0,0 +1,203 @@
+# src/usage_ledger.py
+"""
+Per-call accounting for LLM usage (SQLite).
+
+Every LLM call records its feature, backend, model, prompt/completion tokens,
+latency, cache status (miss / hit / similar) and outcome. Token counts come
+from the provider's `usage` field when available; streamed responses and
+backends without usage are estimated at ~4 characters per token and flagged
+`estimated`. `aggregate("day")` / `aggregate("session")` roll calls up with an
+approximate cost from PRICES, which is enough to size budgets and see which
+feature dominates spend and latency.
+
+Feature and session labels come from `usage_context(...)`, so call sites deep
+inside the curator do not need extra parameters.
+"""
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from src.prompts import estimate_tokens
+
+DEFAULT_PATH = os.environ.get("LLM_USAGE_PATH", os.path.join("data", "llm_usage.sqlite"))
+
+# USD per 1M (prompt, completion) tokens; unknown models are costed at 0
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "llama3-70b-8192": (0.59, 0.79),
+    "llama3-8b-8192": (0.05, 0.08),
+}
+
+PROCESS_SESSION = uuid.uuid4().hex[:12]
+_feature_default = "llm"
+_feature = contextvars.ContextVar("llm_feature", default=_feature_default)
+_session = contextvars.ContextVar("llm_session", default=PROCESS_SESSION)
+
+
+def set_session(session_id):
+    """Label every later call in this thread/context with `session_id` (e.g. once per Streamlit run)."""
+    _session.set(session_id)
+
+
+@contextmanager
+def usage_context(feature=None, session=None, override=True):
+    """Label LLM calls made inside the block with `feature` and/or `session`.
+
+    With override=False an already-set feature (e.g. "note_prefetch") wins.
+    """
+    tokens = []
+    if feature is not None and (override or _feature.get() == _feature_default):
+        tokens.append((_feature, _feature.set(feature)))
+    if session is not None:
+        tokens.append((_session, _session.set(session)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def labelled_iter(iterable, feature=None, session=None, override=True):
+    """Iterate `iterable` with usage labels applied to each step, without leaking them
+    into the consumer's context between yields (for streaming generators)."""
+    ctx = contextvars.copy_context()
+    if feature is not None and (override or ctx.get(_feature, _feature_default) == _feature_default):
+        ctx.run(_feature.set, feature)
+    if session is not None:
+        ctx.run(_session.set, session)
+    it = iter(iterable)
+    while True:
+        try:
+            item = ctx.run(next, it)
+        except StopIteration:
+            return
+        yield item
+
+
+def cost_usd(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def messages_tokens(messages):
+    """Estimated prompt tokens of a chat message list (text parts only)."""
+    total = 0
+    for m in messages or ():
+        content = m.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        total += estimate_tokens(content or "") + 4  # per-message overhead
+    return total
+
+
+class UsageLedger:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " ts REAL NOT NULL,"
+            " day TEXT NOT NULL,"
+            " session TEXT NOT NULL,"
+            " feature TEXT NOT NULL,"
+            " backend TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " prompt_tokens INTEGER NOT NULL,"
+            " completion_tokens INTEGER NOT NULL,"
+            " estimated INTEGER NOT NULL,"
+            " latency_s REAL NOT NULL,"
+            " cache TEXT NOT NULL,"
+            " outcome TEXT NOT NULL,"
+            " cost_usd REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_day ON calls(day)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_session ON calls(session)")
+        self._conn.commit()
+
+    def record(self, backend, model, prompt_tokens=0, completion_tokens=0, latency_s=0.0,
+               cache="miss", outcome="ok", estimated=False, feature=None, session=None):
+        now = time.time()
+        prompt_tokens, completion_tokens = int(prompt_tokens or 0), int(completion_tokens or 0)
+        row = (
+            now, time.strftime("%Y-%m-%d", time.localtime(now)),
+            session or _session.get(), feature or _feature.get(), backend, model,
+            prompt_tokens, completion_tokens, int(bool(estimated)), float(latency_s), cache, outcome,
+            cost_usd(model, prompt_tokens, completion_tokens),
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO calls (ts, day, session, feature, backend, model, prompt_tokens, completion_tokens,"
+                " estimated, latency_s, cache, outcome, cost_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            self._conn.commit()
+
+    def aggregate(self, by="day", since=None):
+        """Totals grouped by `by` ("day", "session", "feature" or "model") and feature, newest first."""
+        if by not in ("day", "session", "feature", "model"):
+            raise ValueError(f"cannot aggregate by {by!r}")
+        group = f"{by}, feature" if by != "feature" else "feature"
+        sql = (
+            f"SELECT {group}, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd),"
+            " AVG(CASE WHEN cache = 'miss' THEN latency_s END),"
+            " SUM(cache != 'miss'), SUM(outcome != 'ok'), MAX(ts)"
+            " FROM calls WHERE ts >= ?"
+            f" GROUP BY {group} ORDER BY MAX(ts) DESC"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, (since or 0,)).fetchall()
+        keys = ([by] if by != "feature" else []) + [
+            "feature", "calls", "prompt_tokens", "completion_tokens", "cost_usd",
+            "avg_latency_s", "cache_hits", "errors",
+        ]
+        return [dict(zip(keys, row[:-1])) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def ledger():
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = UsageLedger()
+    return _ledger
+
+
+def record(backend, model, **kwargs):
+    """Record one call in the process ledger; accounting never breaks the caller."""
+    try:
+        ledger().record(backend, model, **kwargs)
+    except Exception:
+        pass
+
+
+def record_response(response, backend, model, latency_s, messages=None, **kwargs):
+    """Record an OpenAI-style chat completion, using `response.usage` when present."""
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        record(backend, model, prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens,
+               latency_s=latency_s, **kwargs)
+        return
+    try:
+        text = response.choices[0].message.content or ""
+    except (AttributeError, IndexError):
+        text = ""
+    record(backend, model, prompt_tokens=messages_tokens(messages), completion_tokens=estimate_tokens(text),
+           latency_s=latency_s, estimated=True, **kwargs)
@@ -4,14 +4,16 @@ import pandas as pd
 import plotly.express as px
 from PIL import Image
 import io
+import uuid
 import base64
 
-from groq import Groq   # 🔥 OpenAI → Groq 로 변경
+from src.llm_backends import GroqBackend   # 🔥 OpenAI → Groq 로 변경
+from src import usage_ledger
 
 # -----------------------------
-# Initialize Groq Client
+# Initialize Groq Backend
 # -----------------------------
-client = Groq(api_key=st.secrets[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])
+backend = GroqBackend(api_key=st.secrets["GROQ_API_KEY"], model="llama3-70b-8192")
 
 def generate_curator_note(title, artist, year):
     prompt = f"""
@@ -28,14 +30,11 @@ Write in 2–4 paragraphs, focusing on:
 - significance in art history
 """
 
-    response = client.chat.completions.create(
-        model="llama3-70b",
-        messages=[
+    with usage_ledger.usage_context(feature="curator_note"):
+        return backend.complete([
             {"role": "system", "content": "You are a professional art curator."},
             {"role": "user", "content": prompt},
-        ]
-    )
-    return response.choices[0].message["content"]
+        ], temperature=None, max_tokens=None)  # API defaults: 2–4 paragraphs must not be cut off
 
 
 def generate_ai_art_caption():
@@ -44,14 +43,11 @@ You are an art curator specializing in contemporary AI-generated works.
 Write a refined, elegant caption describing this artwork.
 """
 
-    response = client.chat.completions.create(
-        model="llama3-70b",
-        messages=[
+    with usage_ledger.usage_context(feature="ai_caption"):
+        return backend.complete([
             {"role": "system", "content": "You write elegant museum-style captions."},
             {"role": "user", "content": prompt},
-        ]
-    )
-    return response.choices[0].message["content"]
+        ], temperature=None, max_tokens=None)  # API defaults: 2–4 paragraphs must not be cut off
 
 
 # -----------------------------
@@ -72,6 +68,7 @@ def fetch_random_met_artwork():
 # Streamlit UI
 # -----------------------------
 st.set_page_config(page_title="AI Art Museum", page_icon="🎨", layout="wide")
+usage_ledger.set_session(st.session_state.setdefault("usage_session", uuid.uuid4().hex[:12]))
 
 st.title("🎨 AI Museum — Curator + AI Art + Analytics")
 
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """A throwaway usage ledger, so tests never write to data/llm_usage.sqlite."""
+    from src import usage_ledger
+    fresh = usage_ledger.UsageLedger(":memory:")
+    monkeypatch.setattr(usage_ledger, "_ledger", fresh)
+    return fresh
+
+
+@pytest.fixture
+def note_store(monkeypatch, ledger):
+    """The curator with an in-memory note store and no backend override."""
+    from src import curator
+    from src.note_store import NoteStore
+    store = NoteStore(":memory:")
+    monkeypatch.setattr(curator, "_store", store)
+    monkeypatch.setattr(curator, "_similar", None)
+    monkeypatch.setattr(curator, "_backend", None)
+    return store
@@ -0,0 +1,24 @@
+from src import batch_notes
+from src.batch_notes import MockBatchClient
+from src.note_store import NoteStore
+
+METAS = [
+    {"objectID": 1, "title": "Water Lilies", "artistDisplayName": "Claude Monet"},
+    {"objectID": 2, "title": "Wheat Field with Cypresses", "artistDisplayName": "Vincent van Gogh"},
+]
+
+
+def test_mock_batch_fills_the_store(note_store):
+    store = NoteStore(":memory:")
+    notes = batch_notes.generate_notes(METAS, client=MockBatchClient(steps_until_done=2), poll_interval=0, store=store)
+    assert notes == {1: "[mock curator note] Water Lilies", 2: "[mock curator note] Wheat Field with Cypresses"}
+    assert len(store) == 2
+    assert len(note_store) == 0  # the curator's own store is untouched
+
+
+def test_stored_notes_are_not_requested_again(note_store):
+    store = NoteStore(":memory:")
+    batch_notes.generate_notes(METAS[:1], client=MockBatchClient(), poll_interval=0, store=store)
+    lines, pending = batch_notes.build_requests(METAS + METAS, store)
+    assert len(lines) == 1
+    assert [object_id for object_id, _, _ in pending.values()] == [2]
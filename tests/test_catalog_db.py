@@ -0,0 +1,46 @@
+from src.catalog_db import CatalogDB
+from src.catalog_writer import CatalogWriter, tombstone
+
+MONET = {"objectID": 1, "title": "Water Lilies", "artistDisplayName": "Claude Monet",
+         "objectBeginDate": 1906, "objectEndDate": 1906, "country": "France"}
+
+
+def test_upsert_keeps_columns_the_caller_did_not_supply():
+    db = CatalogDB(":memory:")
+    db._upsert([db.met_row(MONET, note="A curator note.")])
+    db.upsert_met([dict(MONET, title="Water Lilies (detail)", country="")])
+    row = db.query()[0]
+    assert row["title"] == "Water Lilies (detail)"
+    assert row["curator_note"] == "A curator note."
+    assert row["country"] == "France"
+    assert len(db) == 1
+
+
+def test_query_by_artist_and_overlapping_years():
+    db = CatalogDB(":memory:")
+    db.upsert_met([
+        MONET,
+        {"objectID": 2, "title": "Impression", "artistDisplayName": "Claude Monet", "objectDate": "1872"},
+        {"objectID": 3, "title": "Cypresses", "artistDisplayName": "Vincent van Gogh", "objectBeginDate": 1889},
+    ])
+    assert [r["object_id"] for r in db.query(artist="Claude Monet", year_from=1870, year_to=1890)] == [2]
+    assert db.counts("artist") == [("Claude Monet", 2), ("Vincent van Gogh", 1)]
+
+
+def test_import_ndjson_applies_tombstones(tmp_path):
+    db = CatalogDB(":memory:")
+    db.upsert_met([MONET, dict(MONET, objectID=2, title="Other")])
+    path = str(tmp_path / "catalog.ndjson")
+    with CatalogWriter(path) as writer:
+        writer.write({"objectID": 3, "title": "New", "artist": "Someone", "curator_note": "note"})
+        writer.write(tombstone(2))
+    assert db.import_json(path) == 1
+    assert sorted(r["object_id"] for r in db.query()) == [1, 3]
+    assert db.query(ids=[3])[0]["curator_note"] == "note"
+
+
+def test_failed_fetch_placeholders_are_not_upserted():
+    db = CatalogDB(":memory:")
+    db.upsert_met([MONET])
+    assert db.upsert_met([{"objectID": 1, "title": "(failed to fetch)"}, {"objectID": 9, "title": "(failed to fetch)"}]) == 0
+    assert [(r["object_id"], r["title"]) for r in db.query()] == [(1, "Water Lilies")]
@@ -0,0 +1,47 @@
+from src.catalog_writer import CatalogWriter, read_catalog, read_state, write_state, tombstone
+
+
+def test_resume_skips_written_ids_and_drops_a_torn_tail(tmp_path):
+    path = str(tmp_path / "catalog.ndjson")
+    with CatalogWriter(path, fsync_every=1) as writer:
+        writer.write({"objectID": 1, "title": "A"})
+        writer.write({"objectID": 2, "title": "B"})
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"objectID": 3, "tit')  # crash mid-write
+
+    with CatalogWriter(path, resume=True) as writer:
+        assert writer.written_ids == {1, 2}
+        assert 3 not in writer
+        writer.write({"objectID": 3, "title": "C"})
+    assert [e["objectID"] for e in read_catalog(path)] == [1, 2, 3]
+
+
+def test_without_resume_the_file_is_rewritten(tmp_path):
+    path = str(tmp_path / "catalog.ndjson")
+    with CatalogWriter(path) as writer:
+        writer.write({"objectID": 1})
+    with CatalogWriter(path) as writer:
+        writer.write({"objectID": 2})
+    assert [e["objectID"] for e in read_catalog(path)] == [2]
+
+
+def test_tombstones_are_hidden_unless_asked_for(tmp_path):
+    path = str(tmp_path / "catalog.ndjson")
+    with CatalogWriter(path) as writer:
+        writer.write({"objectID": 1, "title": "A"})
+        writer.write(tombstone(2))
+    assert [e["objectID"] for e in read_catalog(path)] == [1]
+    deleted = [e for e in read_catalog(path, include_deleted=True) if e.get("deleted")]
+    assert [e["objectID"] for e in deleted] == [2]
+    assert deleted[0]["deletedAt"]
+
+
+def test_state_sidecar(tmp_path):
+    path = str(tmp_path / "catalog.ndjson")
+    assert read_state(path) == {}
+    write_state(path, refreshedAt="2024-05-01")
+    write_state(path, note="kept")
+    assert read_state(path) == {"refreshedAt": "2024-05-01", "note": "kept"}
+    with open(path + ".state.json", "w", encoding="utf-8") as f:
+        f.write("not json")
+    assert read_state(path) == {}
@@ -0,0 +1,72 @@
+import pytest
+
+from src import curator
+from src.llm_backends import Backend, FakeBackend, FallbackChain, LLMError
+
+META = {"objectID": 1, "title": "Water Lilies", "artistDisplayName": "Claude Monet", "objectDate": "1906"}
+
+
+class StubBackend(Backend):
+    """A 'real' backend (its notes are kept) that answers or fails on demand."""
+    name = "stub"
+
+    def __init__(self, model, fail=False):
+        super().__init__(model)
+        self.fail = fail
+        self.calls = 0
+
+    def _complete(self, messages, temperature, max_tokens):
+        self.calls += 1
+        if self.fail:
+            raise LLMError("down")
+        return f"note by {self.model}"
+
+
+def test_notes_are_stored_and_reused(note_store):
+    backend = StubBackend("primary")
+    curator.set_backend(backend)
+    assert curator.explain_object(META, api_key="k") == "note by primary"
+    assert curator.explain_object(META, api_key="k") == "note by primary"
+    assert backend.calls == 1
+    assert curator.stored_note(META) == "note by primary"
+
+
+def test_fake_backend_notes_are_never_stored(note_store):
+    curator.set_backend(FakeBackend())
+    assert curator.explain_object(META, api_key="k").startswith("[fake:")
+    assert len(note_store) == 0
+
+
+def test_fallback_notes_are_stored_under_their_own_model(note_store):
+    curator.set_backend(FallbackChain([StubBackend("primary", fail=True), StubBackend("backup")]))
+    assert curator.explain_object(META, api_key="k") == "note by backup"
+    assert curator.stored_note(META) is None  # never served as the primary model's note
+    models = note_store._conn.execute("SELECT model FROM notes").fetchall()
+    assert models == [("backup",)]
+
+
+def test_failures_are_text_or_raised(note_store):
+    curator.set_backend(StubBackend("primary", fail=True))
+    assert curator.explain_object(META, api_key="k").startswith("Curator note request failed")
+    with pytest.raises(LLMError):
+        curator.explain_object(META, api_key="k", raise_errors=True)
+    assert len(note_store) == 0
+
+
+def test_stream_joins_a_note_already_in_flight(note_store):
+    import threading
+    import time
+
+    class SlowBackend(StubBackend):
+        def _complete(self, messages, temperature, max_tokens):
+            time.sleep(0.3)
+            return super()._complete(messages, temperature, max_tokens)
+
+    backend = SlowBackend("primary")
+    curator.set_backend(backend)
+    prefetch = threading.Thread(target=curator.explain_object, args=(META, "k"))
+    prefetch.start()
+    time.sleep(0.05)
+    assert "".join(curator.stream_explain_object(META, api_key="k")) == "note by primary"
+    prefetch.join(5)
+    assert backend.calls == 1
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from src import llm_backends
+from src import usage_ledger
+from src.llm_backends import FakeBackend, FallbackChain, LLMError
+
+MESSAGES = [{"role": "system", "content": "curator"}, {"role": "user", "content": "Title: Water Lilies"}]
+
+
+def test_fake_backend_is_deterministic(ledger):
+    backend = FakeBackend()
+    assert backend.complete(MESSAGES) == backend.complete(MESSAGES)
+    assert "Water Lilies" in backend.complete(MESSAGES)
+    assert len(ledger) == 3  # one ledger row per call
+
+
+def test_chain_falls_back_to_the_next_backend(ledger):
+    chain = FallbackChain([FakeBackend(fail=True, name="primary"), FakeBackend(name="backup")])
+    text, backend = chain.complete_with_source(MESSAGES)
+    assert backend.name == "backup"
+    assert text.startswith("[backup:")
+    assert chain.complete(MESSAGES) == text
+
+
+def test_chain_raises_when_every_backend_fails(ledger):
+    chain = FallbackChain([FakeBackend(fail=True, name="a"), FakeBackend(fail=True, name="b")])
+    with pytest.raises(LLMError) as excinfo:
+        chain.complete(MESSAGES)
+    assert "a:" in str(excinfo.value) and "b:" in str(excinfo.value)
+
+
+def test_stream_falls_back_before_the_first_chunk(ledger):
+    chain = FallbackChain([FakeBackend(fail=True, name="primary"), FakeBackend(name="backup")])
+    pairs = list(chain.stream_with_source(MESSAGES))
+    assert {backend.name for _, backend in pairs} == {"backup"}
+    assert "".join(chunk for chunk, _ in pairs).strip() == FakeBackend(name="backup").complete(MESSAGES)
+
+
+def test_hedge_races_a_slow_primary(ledger, monkeypatch):
+    monkeypatch.setattr(llm_backends, "HEDGE_DEFAULT_DELAY", 0.05)
+    chain = FallbackChain([FakeBackend(delay=1.0, name="slow"), FakeBackend(name="fast")], hedge=True)
+    start = time.perf_counter()
+    text, backend = chain.complete_with_source(MESSAGES)
+    assert backend.name == "fast"
+    assert time.perf_counter() - start < 0.8
+
+
+def test_no_hedge_when_the_primary_answers_in_time(ledger, monkeypatch):
+    monkeypatch.setattr(llm_backends, "HEDGE_DEFAULT_DELAY", 0.5)
+    chain = FallbackChain([FakeBackend(name="primary"), FakeBackend(name="backup")], hedge=True)
+    assert chain.complete_with_source(MESSAGES)[1].name == "primary"
+    assert [row["calls"] for row in ledger.aggregate(by="model")] == [1]
+
+
+def test_hedged_calls_keep_the_callers_usage_labels(ledger, monkeypatch):
+    monkeypatch.setattr(llm_backends, "HEDGE_DEFAULT_DELAY", 0.05)
+    chain = FallbackChain([FakeBackend(delay=0.3, name="slow"), FakeBackend(name="fast")], hedge=True)
+    with usage_ledger.usage_context(feature="curator_note", session="s1"):
+        chain.complete(MESSAGES)
+    time.sleep(0.4)  # let the slow backend finish and record its row
+    rows = ledger.aggregate(by="session")
+    assert [(r["session"], r["feature"], r["calls"]) for r in rows] == [("s1", "curator_note", 2)]
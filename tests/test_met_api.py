@@ -0,0 +1,62 @@
+import pytest
+
+from src import met_api
+from src.circuit_breaker import CircuitBreaker, CLOSED, OPEN
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+
+
+class _Session:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return _Response(self.status_code)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """_get_json against a stub session, with a fresh breaker and no backoff sleeps."""
+    def use(status_code):
+        session = _Session(status_code)
+        monkeypatch.setattr(met_api, "_session", session)
+        return session
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+    monkeypatch.setattr(met_api, "_breaker", breaker)
+    monkeypatch.setattr(met_api.time, "sleep", lambda s: None)
+    use.breaker = breaker
+    return use
+
+
+def test_one_failing_request_counts_once(api):
+    session = api(500)
+    with pytest.raises(met_api.requests.HTTPError):
+        met_api._get_json("/objects/1")
+    assert session.calls == met_api.MAX_RETRIES + 1
+    assert api.breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("status", [403, 429])
+def test_throttling_never_opens_the_circuit(api, status):
+    api(status)
+    for _ in range(10):
+        with pytest.raises(met_api.requests.HTTPError):
+            met_api._get_json("/objects/1")
+    assert api.breaker.state == CLOSED
+
+
+def test_repeated_server_errors_open_the_circuit(api):
+    api(500)
+    for _ in range(5):
+        with pytest.raises(met_api.requests.HTTPError):
+            met_api._get_json("/objects/1")
+    assert api.breaker.state == OPEN
+    with pytest.raises(met_api.CircuitOpenError):
+        met_api._get_json("/objects/1")
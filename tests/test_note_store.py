@@ -0,0 +1,51 @@
+import sqlite3
+
+from src.note_store import NoteStore, note_key
+from src.similarity import SimilarityIndex, unpack_signature
+
+
+def test_put_get_and_invalidate():
+    store = NoteStore(":memory:")
+    key = note_key("title: A", "gpt-4o-mini", 0.3, "v1")
+    store.put(key, "note", object_id=1, model="gpt-4o-mini", prompt_version="v1")
+    assert store.get(key) == "note"
+    assert store.invalidate(1) == 1
+    assert store.get(key) is None
+
+
+def test_key_depends_on_model_and_prompt_version():
+    keys = {note_key("title: A", m, 0.3, v) for m in ("a", "b") for v in ("v1", "v2")}
+    assert len(keys) == 4
+
+
+def test_legacy_store_is_migrated_and_signatures_backfilled(tmp_path):
+    path = str(tmp_path / "notes.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE notes (key TEXT PRIMARY KEY, object_id INTEGER, model TEXT NOT NULL,"
+        " prompt_version TEXT NOT NULL, note TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO notes VALUES ('old', 1, 'm', 'v1', 'old note', 0)")
+    conn.commit()
+    conn.close()
+
+    store = NoteStore(path)
+    assert store.get("old") == "old note"
+    columns = {row[1] for row in store._conn.execute("PRAGMA table_info(notes)")}
+    assert {"meta_str", "signature"} <= columns
+
+    store._conn.execute("UPDATE notes SET meta_str = 'title: Water Lilies; artistDisplayName: Claude Monet'")
+    (_, _, _, _, sig), = store.similarity_rows()
+    stored = store._conn.execute("SELECT signature FROM notes").fetchone()[0]
+    assert unpack_signature(stored) == sig
+
+
+def test_similarity_index_from_stored_signatures():
+    store = NoteStore(":memory:")
+    text = "title: Water Lilies; artistDisplayName: Claude Monet; objectDate: 1906; medium: Oil on canvas"
+    store.put("k1", "note", model="m", prompt_version="v1", meta_str=text)
+    index = SimilarityIndex(0.8)
+    for key, meta_str, version, model, signature in store.similarity_rows():
+        index.add(key, None, (version, model), signature=signature)
+    match = index.query(text.replace("1906", "1907"))
+    assert match is not None and match[0] == "k1"
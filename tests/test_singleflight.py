@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def _run_concurrently(n, fn):
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight, calls, release = SingleFlight(), [], threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "note"
+
+    def call():
+        return flight.do("key", slow)
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results, errors = _run_concurrently(4, call)
+    assert results == ["note"] * 4 and errors == [None] * 4
+    assert len(calls) == 1
+    assert flight.shared == 3
+    assert flight.in_flight() == 0
+
+
+def test_error_is_shared_and_the_key_released():
+    flight, calls = SingleFlight(), []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    results, errors = _run_concurrently(3, lambda: flight.do("key", failing))
+    assert len(calls) == 1
+    assert all(isinstance(e, RuntimeError) and str(e) == "upstream down" for e in errors)
+
+    # the failure is not cached: the next call runs again
+    with pytest.raises(RuntimeError):
+        flight.do("key", failing)
+    assert len(calls) == 2
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.shared == 0
+
+
+def test_join_waits_for_the_call_in_flight():
+    flight, release = SingleFlight(), threading.Event()
+    leader = threading.Thread(target=flight.do, args=("key", lambda: release.wait(5) and "note"))
+    leader.start()
+    time.sleep(0.05)
+    threading.Timer(0.1, release.set).start()
+    assert flight.join("key") == (True, "note")
+    leader.join(5)
+    assert flight.join("key") == (False, None)  # nothing in flight any more
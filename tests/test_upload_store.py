@@ -0,0 +1,20 @@
+from src import upload_store
+
+
+def test_duplicates_are_stored_and_indexed_once(tmp_path):
+    root = str(tmp_path / "uploads")
+    first = upload_store.save_upload(b"png bytes", "Sunset", root=root)
+    again = upload_store.save_upload(b"png bytes", "Sunset", root=root)
+    renamed = upload_store.save_upload(b"png bytes", "Sunset (copy)", root=root)
+    assert again == first
+    assert renamed["sha256"] == first["sha256"]
+    assert [r["title"] for r in upload_store.iter_uploads(root)] == ["Sunset", "Sunset (copy)"]
+    assert upload_store.read_blob(first["sha256"], root=root) == b"png bytes"
+
+
+def test_torn_index_lines_are_skipped(tmp_path):
+    root = str(tmp_path / "uploads")
+    upload_store.save_upload(b"a", "A", root=root)
+    with open(upload_store._index_path(root), "a", encoding="utf-8") as f:
+        f.write('{"sha256": "tor')
+    assert [r["title"] for r in upload_store.iter_uploads(root)] == ["A"]
@@ -1,8 +1,11 @@
-import os, json
+import os
 import streamlit as st
-from src.met_api import search, get_object
+from src.met_api import search, get_objects
 from src.curator import explain_object
+from src.image_cache import warm_images
 from src.viz import plot_year_histogram
+from src import upload_store
+from src.catalog_db import catalog_db
 from PIL import Image
 from io import BytesIO
 import numpy as np
@@ -30,13 +33,16 @@ with tab_gallery:
         if not ids:
             st.warning("검색 결과가 없습니다.")
         else:
-            metas = [get_object(i) for i in ids[:max_results]]
+            metas = get_objects(ids[:max_results])
             cols = st.columns(cols_num)
+            thumb_width = 1200 // cols_num
+            # 모든 썸네일을 동시에 받아 둔 뒤 그림
+            thumbs = warm_images([m.get("primaryImageSmall") or m.get("primaryImage") for m in metas], thumb_width)
             for i, meta in enumerate(metas):
                 with cols[i%cols_num]:
                     img = meta.get("primaryImageSmall") or meta.get("primaryImage")
                     if img:
-                        st.image(img, use_column_width=True, caption=f"**{meta.get('title','Untitled')}** — {meta.get('artistDisplayName','Unknown')}")
+                        st.image(thumbs[img].result(), use_column_width=True, caption=f"**{meta.get('title','Untitled')}** — {meta.get('artistDisplayName','Unknown')}")
                     
                     # Curator Note 버튼
                     if st.button("Curator Note", key=f"note_{meta.get('objectID')}"):
@@ -53,27 +59,22 @@ with tab_gallery:
 
     # Generated Works Section (unchanged)
     st.markdown("### Generated / Uploaded Artworks")
-    gen_path = os.path.join("data","generated_catalog.json")
-    gen = []
-    if os.path.exists(gen_path):
-        try:
-            with open(gen_path,"r",encoding="utf-8") as f:
-                gen = json.load(f)
-        except:
-            gen = []
+    db = catalog_db()
+    migrated = upload_store.import_legacy_json()  # 예전 latin1 JSON 항목이 있으면 한 번만 옮김
+    if migrated or not db.query(source="upload", limit=1):
+        db.import_uploads()
+    gen = db.query(source="upload", order_by="updated_at")
 
     if gen:
         cols = st.columns(3)
         for i,item in enumerate(gen):
             with cols[i%3]:
-                img_bytes = BytesIO(bytes(item.get("image_bytes"), "latin1")) if item.get("image_bytes") else None
-                if img_bytes:
-                    try:
-                        img = Image.open(img_bytes)
-                        st.image(img, use_column_width=True, caption=f"**{item.get('title','Generated')}**")
-                    except:
-                        st.write("(이미지 로드 실패)")
-                st.write(item.get("description",""))
+                img_path = item.get("image")
+                if img_path and os.path.exists(img_path):
+                    st.image(img_path, use_column_width=True, caption=f"**{item.get('title') or 'Generated'}**")
+                else:
+                    st.write("(이미지 로드 실패)")
+                st.write(item.get("description") or "")
 
 
 # ------------------ DASHBOARD TAB ------------------
@@ -83,8 +84,12 @@ with tab_dashboard:
     n_dash = st.slider("Sample size", 10,100,30, key="dash_n")
     if q_dash:
         ids_dash = search(q_dash, n_dash)
-        metas_dash = [get_object(i) for i in ids_dash]
-        fig, df = plot_year_histogram(metas_dash)
+        metas_dash = get_objects(ids_dash)
+        db = catalog_db()
+        db.upsert_met(metas_dash)
+        # begin_year는 카탈로그가 objectBeginDate/objectDate에서 정리해 둔 값
+        rows_dash = [dict(r, year=r["begin_year"]) for r in db.query(ids=ids_dash)]
+        fig, df = plot_year_histogram(rows_dash)
         if fig:
             st.plotly_chart(fig, use_container_width=True)
             if st.checkbox("Show Sample Table"):
@@ -131,19 +136,14 @@ with tab_upload:
 
             # Save uploaded image
             if save_to_catalog:
-                os.makedirs("data", exist_ok=True)
-                path = os.path.join("data","generated_catalog.json")
-                try:
-                    with open(path,"r",encoding="utf-8") as g:
-                        catalog = json.load(g)
-                except:
-                    catalog=[]
-                bio = BytesIO()
-                img.save(bio, format="PNG")
-                b = bio.getvalue().decode("latin1")
-                catalog.append({"title":f.name, "description":"","image_bytes":b})
-                with open(path,"w",encoding="utf-8") as g:
-                    json.dump(catalog,g,ensure_ascii=False, indent=2)
-                st.success("Saved to generated_catalog.json")
+                # Streamlit reruns this block on every interaction: save each file once per session
+                saved = st.session_state.setdefault("saved_uploads", {})
+                record = saved.get((f.name, f.size))
+                if record is None:
+                    bio = BytesIO()
+                    img.save(bio, format="PNG")
+                    record = saved[(f.name, f.size)] = upload_store.save_upload(bio.getvalue(), f.name)
+                    catalog_db().upsert_upload(record)
+                st.success(f"Saved to the local catalog ({record['sha256'][:12]})")
     else:
         st.info("Upload images to visualize RGB color distribution and palette.")